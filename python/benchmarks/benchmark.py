@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+# Benchmarks drive jenkins_manage.py from the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jenkins_manage
+from fake_jenkins import startFakeJenkins, defaultFakeSettings
+
+def buildBenchmarkConfig(baseUrl, fakeJenkins):
+    pipeLineList = [{'name': pipeLineName, 'repo': pipeLineName.split('_')[1]} for pipeLineName in fakeJenkins.pipeLineNames()]
+    return {
+        'userInfo': {'baseUrl': baseUrl, 'userName': 'Fake User', 'email': 'fake.user@example.com', 'objectId': 'fake', 'appToken': 'fake', 'crumb': 'fake-crumb'},
+        'previousJobRun': {'pipeLineName': '', 'branchName': '', 'branchOption': '', 'repoName': ''},
+        'excludedPipeLines': [],
+        'pipeLineList': pipeLineList,
+        'repoBranches': {},
+        'repoBranchesUpdatedAt': {}
+    }
+
+def prepareWorkflowDirectory(baseUrl, fakeJenkins, configOverrides):
+    """Point jenkins_manage at a fresh config directory
+
+    Caches and state files are created next to the config so every workflow
+    starts cold unless it warms up itself
+    """
+    workflowDirectory = tempfile.mkdtemp(prefix='jenkins_benchmark_')
+    config = buildBenchmarkConfig(baseUrl, fakeJenkins)
+    for configKey, configValue in configOverrides.items():
+        config[configKey] = configValue
+    jenkins_manage.configFile = os.path.join(workflowDirectory, 'jenkins.json')
+    with open(jenkins_manage.configFile, 'w') as configJson:
+        json.dump(config, configJson)
+    jenkins_manage.config = config
+    jenkins_manage.compiledErrorPatterns = None
+    jenkins_manage.requestScheduler = None
+    if jenkins_manage.runCache is not None:
+        jenkins_manage.runCache.close()
+        jenkins_manage.runCache = None
+    return workflowDirectory, config
+
+def measure(workflow, fakeJenkins, traceMemory):
+    fakeJenkins.resetRequestCounts()
+    if traceMemory:
+        tracemalloc.start()
+    startTime = time.perf_counter()
+    with open(os.devnull, "w") as devNull, contextlib.redirect_stdout(devNull):
+        workflow()
+    wallTime = time.perf_counter() - startTime
+    peakBytes = None
+    if traceMemory:
+        peakBytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'wallSeconds': wallTime, 'requests': fakeJenkins.totalRequests(), 'requestCounts': dict(fakeJenkins.requestCounts), 'peakBytes': peakBytes}
+
+def getBenchmarkWorkflows(fakeJenkins):
+    """Workflows to benchmark, each returns (setup, workflow)
+
+    setup runs outside of the measurement, Ex. to warm caches
+    """
+    pipeLineName = fakeJenkins.pipeLineNames()[0]
+    branchName = 'develop'
+    jobNumber = str(fakeJenkins.settings['runs'] - 1)
+
+    def getJobRunsWorkflow():
+        jenkins_manage.getJobRuns(jenkins_manage.config, pipeLineName, branchName)
+
+    def processRunWorkflow():
+        runItem = fakeJenkins.runItem(fakeJenkins.settings['runs'] - 1)
+        jenkins_manage.processRun(jenkins_manage.config, runItem.items(), pipeLineName, branchName)
+
+    def updateRepoBranchesWorkflow():
+        jenkins_manage.updateRepoBranches(jenkins_manage.config['pipeLineList'], jenkins_manage.config)
+
+    def getJobErrorsWorkflow():
+        jenkins_manage.getJobErrors(jenkins_manage.config, pipeLineName, branchName, jobNumber)
+
+    def getJobConsoleTextWorkflow():
+        jenkins_manage.getJobConsoleText(jenkins_manage.config, pipeLineName, branchName, jobNumber)
+
+    return [
+        ('getJobRuns (cold cache)', None, getJobRunsWorkflow),
+        ('getJobRuns (warm cache)', getJobRunsWorkflow, getJobRunsWorkflow),
+        ('processRun', None, processRunWorkflow),
+        ('updateRepoBranches', None, updateRepoBranchesWorkflow),
+        ('getJobErrors', None, getJobErrorsWorkflow),
+        ('getJobErrors (archived log)', getJobErrorsWorkflow, getJobErrorsWorkflow),
+        ('getJobConsoleText', None, getJobConsoleTextWorkflow),
+    ]
+
+def runBenchmarks(fakeSettings, repeat, traceMemory, selectedWorkflows, configOverrides):
+    server, fakeJenkins, baseUrl = startFakeJenkins(fakeSettings)
+    results = []
+    try:
+        # First request pays for importing requests and opening the pool, keep it out of measurements
+        prepareWorkflowDirectory(baseUrl, fakeJenkins, configOverrides)
+        jenkins_manage.makeAuthRequest('crumbIssuer/api/json', 'get', jenkins_manage.config)
+        for workflowName, setup, workflow in getBenchmarkWorkflows(fakeJenkins):
+            if selectedWorkflows and not any(selected in workflowName for selected in selectedWorkflows):
+                continue
+            measurements = []
+            for repeatIndex in range(repeat):
+                workflowDirectory, config = prepareWorkflowDirectory(baseUrl, fakeJenkins, configOverrides)
+                try:
+                    if setup:
+                        with open(os.devnull, "w") as devNull, contextlib.redirect_stdout(devNull):
+                            setup()
+                    measurements.append(measure(workflow, fakeJenkins, traceMemory))
+                finally:
+                    jenkins_manage.flushState()
+                    shutil.rmtree(workflowDirectory, ignore_errors=True)
+            wallTimes = sorted(measurement['wallSeconds'] for measurement in measurements)
+            results.append({
+                'workflow': workflowName,
+                'repeat': repeat,
+                'minSeconds': wallTimes[0],
+                'medianSeconds': wallTimes[len(wallTimes) // 2],
+                'requests': measurements[-1]['requests'],
+                'requestCounts': measurements[-1]['requestCounts'],
+                'peakBytes': max(measurement['peakBytes'] for measurement in measurements) if traceMemory else None
+            })
+    finally:
+        server.shutdown()
+    return results
+
+def printBenchmarkResults(results, fakeSettings):
+    print("Fake jenkins: {}".format(', '.join("{}={}".format(settingName, settingValue) for settingName, settingValue in fakeSettings.items())))
+    resultFormat = "{:<28} {:>10} {:>10} {:>9} {:>12}"
+    print(resultFormat.format('Workflow', 'Median', 'Min', 'Requests', 'Peak memory'))
+    for result in results:
+        peakMemory = "{:.1f}MB".format(result['peakBytes'] / 1024 / 1024) if result['peakBytes'] is not None else '-'
+        print(resultFormat.format(result['workflow'], "{:.3f}s".format(result['medianSeconds']), "{:.3f}s".format(result['minSeconds']), result['requests'], peakMemory))
+
+def compareWithBaseline(results, baseline, timeTolerance, timeSlack):
+    """Compare results with a saved benchmark run
+
+    A workflow regressed when its median wall time grew by more than
+    timeTolerance (fraction) and timeSlack seconds, or when it sent more
+    requests
+
+    Returns
+    -------
+    list
+        (workflow, baseline result, result, regressions) for workflows in both runs
+    """
+    baselineResults = {result['workflow']: result for result in baseline['results']}
+    comparisons = []
+    for result in results:
+        baselineResult = baselineResults.get(result['workflow'])
+        if baselineResult is None:
+            continue
+        regressions = []
+        maxSeconds = max(baselineResult['medianSeconds'] * (1 + timeTolerance), baselineResult['medianSeconds'] + timeSlack)
+        if result['medianSeconds'] > maxSeconds:
+            regressions.append("median {:.3f}s > {:.3f}s".format(result['medianSeconds'], maxSeconds))
+        if result['requests'] > baselineResult['requests']:
+            regressions.append("requests {} > {}".format(result['requests'], baselineResult['requests']))
+        comparisons.append((result['workflow'], baselineResult, result, regressions))
+    return comparisons
+
+def printBaselineComparisons(comparisons):
+    comparisonFormat = "{:<28} {:>10} {:>10} {:>9} {:>9}  {}"
+    print(comparisonFormat.format('Workflow', 'Baseline', 'Median', 'Requests', 'Baseline', 'Result'))
+    for workflowName, baselineResult, result, regressions in comparisons:
+        print(comparisonFormat.format(workflowName, "{:.3f}s".format(baselineResult['medianSeconds']), "{:.3f}s".format(result['medianSeconds']), result['requests'], baselineResult['requests'], 'REGRESSION: ' + ', '.join(regressions) if regressions else 'OK'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark jenkins_manage workflows against a local fake jenkins")
+    for settingName, settingValue in defaultFakeSettings.items():
+        parser.add_argument('--' + settingName, type=type(settingValue), default=settingValue)
+    parser.add_argument('--repeat', type=int, default=3, help="Measurements per workflow")
+    parser.add_argument('--workflow', action='append', help="Only run workflows containing this text, can be repeated")
+    parser.add_argument('--no-memory', action='store_true', help="Skip peak memory tracing, it slows down workflows")
+    parser.add_argument('--config', default='{}', help="JSON object merged into the benchmark config, Ex. '{\"runSettings\": {\"changeSetWorkers\": 1}}'")
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    parser.add_argument('--save-baseline', metavar='FILE', help="Save results as baseline for later --baseline runs")
+    parser.add_argument('--baseline', metavar='FILE', help="Compare with a saved baseline, exit code is 1 when a workflow regressed")
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help="Allowed growth of median wall time over the baseline (fraction)")
+    parser.add_argument('--time-slack', type=float, default=0.05, help="Allowed growth of median wall time in seconds, hides noise of fast workflows")
+    args = parser.parse_args()
+
+    fakeSettings = {settingName: getattr(args, settingName) for settingName in defaultFakeSettings}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baselineJson:
+            baseline = json.load(baselineJson)
+        if baseline['fakeSettings'] != fakeSettings:
+            parser.error("Baseline was recorded with different fake jenkins settings: {}".format(baseline['fakeSettings']))
+    results = runBenchmarks(fakeSettings, args.repeat, not args.no_memory, args.workflow, json.loads(args.config))
+    benchmarkRun = {'fakeSettings': fakeSettings, 'results': results}
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baselineJson:
+            json.dump(benchmarkRun, baselineJson, indent=4)
+    comparisons = compareWithBaseline(results, baseline, args.time_tolerance, args.time_slack) if baseline else []
+    if args.format == 'json':
+        if baseline:
+            benchmarkRun['regressions'] = {workflowName: regressions for workflowName, baselineResult, result, regressions in comparisons if regressions}
+        print(json.dumps(benchmarkRun, indent=4))
+    else:
+        printBenchmarkResults(results, fakeSettings)
+        if baseline:
+            print()
+            printBaselineComparisons(comparisons)
+    if any(regressions for workflowName, baselineResult, result, regressions in comparisons):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+
+import json
+import re
+import time
+import threading
+import argparse
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Variables
+jsonContentType = 'application/json;charset=utf-8'
+textContentType = 'text/plain;charset=utf-8'
+defaultFakeSettings = {
+    "pipelines": 33,
+    "branches": 20,
+    "runs": 50,
+    "changeSetsPerRun": 3,
+    "stagesPerRun": 8,
+    "consoleMegabytes": 1,
+    "latencyMillis": 0,
+    "queueSeconds": 0.5,
+    "buildSeconds": 2.0,
+    "maxRequestsPerSecond": 0
+}
+consoleBlockLines = [
+    "[2024-06-11T10:15:{:02d}.123Z] [Pipeline] sh",
+    "+ oc rollout status deployment/om-order-v1-0 -n om-dev --timeout=600s",
+    "Waiting for deployment \"om-order-v1-0\" rollout to finish: 1 of 2 updated replicas are available...",
+    "[INFO] Building jar: /home/jenkins/agent/workspace/om-order/target/om-order-1.0.{}.jar",
+    "Downloaded from nexus: https://nexus.example.com/repository/maven-public/org/springframework/spring-core/5.3.{}/spring-core.jar",
+]
+consoleErrorLines = [
+    "ERROR: script returned exit code 1",
+    "java.lang.Exception: Connection refused to om-order-v1-0:8080",
+    "script returned exit code 143",
+]
+runPathPattern = re.compile(r'^/job/([^/]+)/job/([^/]+)/(\d+|lastBuild|lastSuccessfulBuild|lastFailedBuild)/(.*)$')
+branchPathPattern = re.compile(r'^/job/([^/]+)/job/([^/]+)/(.*)$')
+pipeLinePathPattern = re.compile(r'^/job/([^/]+)/(.*)$')
+queuePathPattern = re.compile(r'^/queue/item/(\d+)/api/json$')
+pipeLineBuildPathPattern = re.compile(r'^(\d+)/(.*)$')
+treeRangePattern = re.compile(r'\{(\d*),(\d*)\}$')
+
+def buildConsoleBlock():
+    """Build a block of console lines repeated to make up console text
+
+    Roughly one in forty lines is an error line so error extraction has
+    realistic work to do
+    """
+    lines = []
+    for index in range(400):
+        if index % 40 == 39:
+            lines.append(consoleErrorLines[index % len(consoleErrorLines)])
+        else:
+            lines.append(consoleBlockLines[index % len(consoleBlockLines)].format(index % 60))
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+class FakeJenkins:
+    """State of the fake jenkins, shared by all request handlers"""
+
+    def __init__(self, fakeSettings):
+        self.settings = dict(defaultFakeSettings)
+        self.settings.update(fakeSettings)
+        self.consoleBlock = buildConsoleBlock()
+        self.requestCounts = {}
+        self.queueItems = {}
+        self.nextQueueId = 1
+        self.throttleWindow = 0
+        self.throttleWindowRequests = 0
+        self.lock = threading.Lock()
+
+    def pipeLineNames(self):
+        return ["Fake{:02d}_om-service-{:02d}_Multibranch_Pipeline_OpenShift".format(index, index) for index in range(self.settings['pipelines'])]
+
+    def branchNames(self):
+        branchNames = ['develop', 'feature/pre-develop']
+        branchNames += ["feature/JIRA-{}-change".format(1000 + index) for index in range(max(0, self.settings['branches'] - 2))]
+        return branchNames[:self.settings['branches']]
+
+    def recordRequest(self, endpoint):
+        with self.lock:
+            self.requestCounts[endpoint] = self.requestCounts.get(endpoint, 0) + 1
+
+    def admitRequest(self):
+        # Like a throttling proxy, at most maxRequestsPerSecond per wall clock second
+        if not self.settings['maxRequestsPerSecond']:
+            return True
+        with self.lock:
+            window = int(time.time())
+            if window != self.throttleWindow:
+                self.throttleWindow = window
+                self.throttleWindowRequests = 0
+            self.throttleWindowRequests += 1
+            return self.throttleWindowRequests <= self.settings['maxRequestsPerSecond']
+
+    def resetRequestCounts(self):
+        with self.lock:
+            self.requestCounts = {}
+
+    def totalRequests(self):
+        with self.lock:
+            return sum(self.requestCounts.values())
+
+    def consoleSize(self):
+        blockCount = max(1, int(self.settings['consoleMegabytes'] * 1024 * 1024 / len(self.consoleBlock)))
+        return blockCount * len(self.consoleBlock), blockCount
+
+    def runStatus(self, runNumber):
+        if runNumber == self.settings['runs']:
+            return 'IN_PROGRESS'
+        return 'FAILED' if runNumber % 7 == 0 else 'SUCCESS'
+
+    def resolveRunNumber(self, runNumber):
+        if runNumber.isdigit():
+            return int(runNumber)
+        if runNumber == 'lastBuild':
+            return self.settings['runs']
+        wantedStatus = 'SUCCESS' if runNumber == 'lastSuccessfulBuild' else 'FAILED'
+        for candidate in range(self.settings['runs'], 0, -1):
+            if self.runStatus(candidate) == wantedStatus:
+                return candidate
+        return None
+
+    def runItem(self, runNumber):
+        stages = []
+        for stageIndex in range(self.settings['stagesPerRun']):
+            stages.append({
+                'id': str(stageIndex + 6),
+                'name': "Stage {}".format(stageIndex + 1),
+                'status': 'SUCCESS',
+                'startTimeMillis': 1718100000000 + runNumber * 3600000 + stageIndex * 60000,
+                'durationMillis': 20000 + stageIndex * 5000 + (runNumber % 10) * 1000
+            })
+        return {
+            'id': str(runNumber),
+            'name': "#{}".format(runNumber),
+            'status': self.runStatus(runNumber),
+            'startTimeMillis': 1718100000000 + runNumber * 3600000,
+            'durationMillis': sum(stage['durationMillis'] for stage in stages),
+            'stages': stages
+        }
+
+    def consoleTail(self, runNumber):
+        # Last lines differ per run, failed runs end with their failure
+        lines = ["[2024-06-11T{:02d}:00:00.000Z] Deploying om-order-v1-0-{:010x}-{:05d}".format(runNumber % 24, runNumber * 7919, runNumber % 100000)]
+        if self.runStatus(runNumber) == 'FAILED':
+            lines += [
+                "[2024-06-11T{:02d}:00:05.000Z] Back-off pulling image \"om-order:{:06X}\"".format(runNumber % 24, runNumber * 4099),
+                "ERROR: rollout of om-order-v1-0 failed after {} ms".format(runNumber * 1000),
+                "Finished: FAILURE"
+            ]
+        else:
+            lines.append("Finished: SUCCESS")
+        return ("\n".join(lines) + "\n").encode('utf-8')
+
+    def changeSets(self, runNumber):
+        items = []
+        for itemIndex in range(self.settings['changeSetsPerRun']):
+            items.append({
+                '_class': 'hudson.plugins.git.GitChangeSet',
+                'msg': "JIRA-{} change {} of run {}".format(1000 + runNumber, itemIndex, runNumber),
+                'author': {'absoluteUrl': 'https://jenkins.example.com/user/dev', 'fullName': "Developer {}".format(itemIndex)},
+                'timestamp': 1718100000000 + runNumber * 3600000 - itemIndex * 60000,
+                'commitId': "{:040x}".format(runNumber * 1000 + itemIndex),
+                'affectedPaths': ["src/main/java/com/example/File{}.java".format(fileIndex) for fileIndex in range(5)],
+                'paths': [{'editType': 'edit', 'file': "src/main/java/com/example/File{}.java".format(fileIndex)} for fileIndex in range(5)]
+            })
+        # Full documents carry much more than change sets, tree= filters cut this
+        return {
+            '_class': 'org.jenkinsci.plugins.workflow.job.WorkflowRun',
+            'actions': [{'_class': 'hudson.model.CauseAction', 'causes': [{'shortDescription': 'Branch indexing'}]} for actionIndex in range(20)],
+            'changeSets': [{'_class': 'hudson.plugins.git.GitChangeSetList', 'items': items, 'kind': 'git'}],
+            'number': runNumber,
+            'result': None if self.runStatus(runNumber) == 'IN_PROGRESS' else self.runStatus(runNumber).replace('FAILED', 'FAILURE'),
+            'building': self.runStatus(runNumber) == 'IN_PROGRESS',
+            'timestamp': 1718100000000 + runNumber * 3600000,
+            'duration': 240000
+        }
+
+class FakeJenkinsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fakeJenkins = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handleRequest()
+
+    def do_POST(self):
+        self.handleRequest()
+
+    def sendBody(self, body, contentType, statusCode=200, headers=None):
+        self.send_response(statusCode)
+        self.send_header('content-type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        for headerName, headerValue in (headers or {}).items():
+            self.send_header(headerName, headerValue)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sendJson(self, data, statusCode=200, headers=None):
+        self.sendBody(json.dumps(data).encode('utf-8'), jsonContentType, statusCode, headers)
+
+    def sendNotFound(self):
+        self.sendBody(b'Not found', 'text/html;charset=utf-8', 404)
+
+    def sendConsoleText(self, start=None, tail=b''):
+        fakeJenkins = self.fakeJenkins
+        blocksSize, blockCount = fakeJenkins.consoleSize()
+        consoleSize = blocksSize + len(tail)
+        self.send_response(200)
+        self.send_header('content-type', textContentType)
+        if start is None:
+            self.send_header('Content-Length', str(consoleSize))
+            self.end_headers()
+            for blockIndex in range(blockCount):
+                self.wfile.write(fakeJenkins.consoleBlock)
+            self.wfile.write(tail)
+            return
+        # progressiveText, whole log is available at once and the build is complete
+        start = min(start, consoleSize)
+        self.send_header('X-Text-Size', str(consoleSize))
+        self.send_header('Content-Length', str(consoleSize - start))
+        self.end_headers()
+        blockSize = len(fakeJenkins.consoleBlock)
+        firstBlock, offset = divmod(min(start, blocksSize), blockSize)
+        for blockIndex in range(firstBlock, blockCount):
+            self.wfile.write(fakeJenkins.consoleBlock[offset:])
+            offset = 0
+        self.wfile.write(tail[max(0, start - blocksSize):])
+
+    def handleRequest(self):
+        fakeJenkins = self.fakeJenkins
+        parsedUrl = urllib.parse.urlparse(self.path)
+        path = parsedUrl.path
+        query = urllib.parse.parse_qs(parsedUrl.query)
+        if fakeJenkins.settings['latencyMillis']:
+            time.sleep(fakeJenkins.settings['latencyMillis'] / 1000.0)
+        if not fakeJenkins.admitRequest():
+            fakeJenkins.recordRequest('throttled')
+            return self.sendBody(b'Too Many Requests', textContentType, 429, {'Retry-After': '1'})
+
+        if path == '/crumbIssuer/api/json':
+            fakeJenkins.recordRequest('crumbIssuer')
+            return self.sendJson({'_class': 'hudson.security.csrf.DefaultCrumbIssuer', 'crumb': 'fake-crumb', 'crumbRequestField': 'Jenkins-Crumb'})
+        if path == '/me/api/json':
+            fakeJenkins.recordRequest('me')
+            return self.sendJson({'fullName': 'Fake User', 'property': [{}, {}, {}, {}, {'address': 'fake.user@example.com'}]})
+        queueMatch = queuePathPattern.match(path)
+        if queueMatch:
+            fakeJenkins.recordRequest('queue')
+            queueId = int(queueMatch.group(1))
+            with fakeJenkins.lock:
+                queueItem = fakeJenkins.queueItems.get(queueId)
+            if queueItem is None:
+                return self.sendNotFound()
+            if time.time() < queueItem['readyAt']:
+                return self.sendJson({'id': queueId, 'why': 'Waiting for next available executor', 'executable': None})
+            return self.sendJson({'id': queueId, 'executable': {'number': queueItem['number'], 'url': queueItem['url']}})
+
+        runMatch = runPathPattern.match(path)
+        if runMatch:
+            pipeLineName, branchName, runNumber, rest = runMatch.groups()
+            runNumber = fakeJenkins.resolveRunNumber(runNumber)
+            if runNumber is None:
+                return self.sendNotFound()
+            if rest == 'api/json':
+                fakeJenkins.recordRequest('run api/json')
+                return self.sendJson(fakeJenkins.changeSets(runNumber))
+            if rest == 'wfapi/describe':
+                fakeJenkins.recordRequest('wfapi/describe')
+                if runNumber < 1 or runNumber > fakeJenkins.settings['runs']:
+                    return self.sendNotFound()
+                return self.sendJson(fakeJenkins.runItem(runNumber))
+            if rest == 'consoleText':
+                fakeJenkins.recordRequest('consoleText')
+                return self.sendConsoleText(tail=fakeJenkins.consoleTail(runNumber))
+            if rest == 'logText/progressiveText':
+                fakeJenkins.recordRequest('progressiveText')
+                return self.sendConsoleText(int(query.get('start', ['0'])[0]), fakeJenkins.consoleTail(runNumber))
+            return self.sendNotFound()
+
+        branchMatch = branchPathPattern.match(path)
+        if branchMatch:
+            pipeLineName, branchName, rest = branchMatch.groups()
+            if rest == 'wfapi/runs':
+                fakeJenkins.recordRequest('wfapi/runs')
+                # Like jenkins, wfapi/runs returns the newest 10 runs
+                newest = fakeJenkins.settings['runs']
+                runNumbers = range(newest, max(0, newest - 10), -1)
+                return self.sendJson([fakeJenkins.runItem(runNumber) for runNumber in runNumbers])
+            if rest == 'api/json':
+                fakeJenkins.recordRequest('branch api/json')
+                builds = [{'number': runNumber, 'result': fakeJenkins.changeSets(runNumber)['result']} for runNumber in range(fakeJenkins.settings['runs'], 0, -1)]
+                # Only the builds[...]{start,end} range form of tree is honoured
+                rangeMatch = treeRangePattern.search(query.get('tree', [''])[0])
+                if rangeMatch:
+                    start = int(rangeMatch.group(1) or 0)
+                    end = int(rangeMatch.group(2) or len(builds))
+                    builds = builds[start:end]
+                return self.sendJson({'builds': builds})
+            return self.sendNotFound()
+
+        pipeLineMatch = pipeLinePathPattern.match(path)
+        if pipeLineMatch:
+            pipeLineName, rest = pipeLineMatch.groups()
+            if rest == 'api/json':
+                fakeJenkins.recordRequest('pipeline api/json')
+                jobs = [{'_class': 'org.jenkinsci.plugins.workflow.job.WorkflowJob', 'name': urllib.parse.quote(branchName, safe='')} for branchName in fakeJenkins.branchNames()]
+                return self.sendJson({'_class': 'org.jenkinsci.plugins.workflow.multibranch.WorkflowMultiBranchProject', 'jobs': jobs})
+            pipeLineBuildMatch = pipeLineBuildPathPattern.match(rest)
+            if pipeLineBuildMatch:
+                return self.handleTriggeredBuild(int(pipeLineBuildMatch.group(1)), pipeLineBuildMatch.group(2), query)
+            if rest == 'buildWithParameters':
+                fakeJenkins.recordRequest('buildWithParameters')
+                with fakeJenkins.lock:
+                    queueId = fakeJenkins.nextQueueId
+                    fakeJenkins.nextQueueId += 1
+                    fakeJenkins.queueItems[queueId] = {
+                        'readyAt': time.time() + fakeJenkins.settings['queueSeconds'],
+                        'number': queueId,
+                        'url': "{}job/{}/{}/".format(self.serverBaseUrl(), pipeLineName, queueId)
+                    }
+                return self.sendBody(b'', 'text/html;charset=utf-8', 201, {'Location': "{}queue/item/{}/".format(self.serverBaseUrl(), queueId)})
+        return self.sendNotFound()
+
+    def handleTriggeredBuild(self, buildNumber, rest, query):
+        # Builds of parameterised (non multibranch) jobs started through buildWithParameters
+        fakeJenkins = self.fakeJenkins
+        with fakeJenkins.lock:
+            queueItem = fakeJenkins.queueItems.get(buildNumber)
+        if queueItem is None or time.time() < queueItem['readyAt']:
+            return self.sendNotFound()
+        building = time.time() < queueItem['readyAt'] + fakeJenkins.settings['buildSeconds']
+        if rest == 'api/json':
+            fakeJenkins.recordRequest('build api/json')
+            result = None if building else ('FAILURE' if buildNumber % 5 == 0 else 'SUCCESS')
+            return self.sendJson({'number': buildNumber, 'building': building, 'result': result, 'timestamp': int(queueItem['readyAt'] * 1000), 'duration': 0})
+        if rest == 'consoleText':
+            fakeJenkins.recordRequest('consoleText')
+            return self.sendConsoleText()
+        if rest == 'logText/progressiveText':
+            fakeJenkins.recordRequest('progressiveText')
+            return self.sendConsoleText(int(query.get('start', ['0'])[0]))
+        return self.sendNotFound()
+
+    def serverBaseUrl(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+def startFakeJenkins(fakeSettings={}, host='127.0.0.1', port=0):
+    """Start fake jenkins on a background thread
+
+    Parameters
+    ----------
+    fakeSettings : dict
+        Overrides of defaultFakeSettings
+    host : str
+        Interface to listen on
+    port : int
+        Port to listen on, 0 picks a free port
+
+    Returns
+    -------
+    tuple
+        (server, fakeJenkins, baseUrl)
+    """
+    fakeJenkins = FakeJenkins(fakeSettings)
+    handler = type('BoundFakeJenkinsHandler', (FakeJenkinsHandler,), {'fakeJenkins': fakeJenkins})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    serverThread = threading.Thread(target=server.serve_forever, daemon=True)
+    serverThread.start()
+    baseUrl = "http://{}:{}/".format(host, server.server_address[1])
+    return server, fakeJenkins, baseUrl
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake jenkins serving synthetic pipelines, runs and console text")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    for settingName, settingValue in defaultFakeSettings.items():
+        parser.add_argument('--' + settingName, type=type(settingValue), default=settingValue)
+    args = parser.parse_args()
+    fakeSettings = {settingName: getattr(args, settingName) for settingName in defaultFakeSettings}
+    server, fakeJenkins, baseUrl = startFakeJenkins(fakeSettings, args.host, args.port)
+    print("Fake jenkins listening on {}".format(baseUrl))
+    print("Pipelines: {}".format(', '.join(fakeJenkins.pipeLineNames()[:3]) + ', ...'))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,215 @@
 #!/usr/bin/env python3
 
+import time
+# Taken before other imports for --profile-startup
+scriptStartTime = time.perf_counter()
+
 import os
 import sys
 import json
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed, Future
 from termcolor import colored
-import requests
-from requests.auth import HTTPBasicAuth
-from pick import pick
 import urllib.parse
 from datetime import datetime
-import time
 import re
+import threading
+import codecs
+import contextlib
+import tempfile
+import atexit
+import shutil
+from array import array
+import mmap
+import gzip
+
+# requests, pick, sqlite3, argparse and the socket modules are imported where
+# they are first used, a launch which only shows menus from cached data does
+# not pay for loading them
+importsDoneTime = time.perf_counter()
 
 # Variables
 configFile = "jenkins.json"
+stateFile = "jenkins_state.json"
+startupTimings = OrderedDict()
 config = ''
 repoOption = ''
 branchOption = ''
 pipeLineName = ''
 jobNumber = ''
+configLock = threading.RLock()
+# Config parts which change while using the tool, these are kept in stateFile
+stateKeys = ['previousJobRun', 'recentBranches', 'repoUsage', 'repoBranches', 'repoBranchesUpdatedAt']
+stateUserInfoKeys = ['userName', 'email', 'crumb']
+stateFlushDelay = 1.0
+branchRefreshExitWait = 2.0
+stateFlushTimer = None
+pendingStateConfig = None
+httpSessions = {}
+requestScheduler = None
+defaultSchedulerSettings = {
+    "enabled": True,
+    "coalesce": True,
+    "requestsPerSecond": 30,
+    "burst": 30,
+    "minRequestsPerSecond": 1,
+    "maxRequestsPerSecond": 100,
+    "increaseStep": 2,
+    "decreaseFactor": 0.5,
+    "latencyTargetSeconds": 2.0,
+    "throttleStatusCodes": [429, 503]
+}
+defaultHttpSettings = {
+    "poolConnections": 4,
+    "poolMaxSize": 16,
+    "connectTimeout": 5,
+    "readTimeout": 60,
+    "retries": 3,
+    "backoffFactor": 0.5,
+    "retryStatusCodes": [500, 502, 503, 504]
+}
+defaultRunSettings = {
+    "runsToConsider": 5,
+    "changeSetWorkers": 8,
+    "branchRefreshWorkers": 8,
+    "branchCacheTtl": 21600,
+    "batchWorkers": 8
+}
+defaultCacheSettings = {
+    "enabled": True,
+    "runCacheFile": "jenkins_cache.db",
+    "runCacheMaxBytes": 52428800
+}
+# Fields each view reads from jenkins api/json documents, used for tree= filters
+apiFields = {
+    "changeSets": [{"changeSets": [{"items": ["msg", {"author": ["fullName"]}, "timestamp"]}]}],
+    "userDetails": ["fullName", {"property": ["address"]}],
+    "pipeLineJobs": [{"jobs": ["name"]}],
+    "lastBuild": ["number", "result", "building", "timestamp", "duration"],
+    "queueItem": ["cancelled", "why", {"executable": ["number", "url"]}],
+    "buildStatus": ["number", "result", "building"],
+    "branchBuilds": [{"builds": ["number"]}],
+    "branchBuildResults": [{"builds": ["number", "result"]}]
+}
+defaultDashboardSettings = {
+    "branch": "develop",
+    "interval": 30,
+    "fullRefreshInterval": 300,
+    "workers": 8
+}
+defaultBuildTrackingSettings = {
+    "followMode": "tail",
+    "queuePollMinInterval": 0.25,
+    "pollMinInterval": 1,
+    "pollMaxInterval": 10,
+    "workers": 8,
+    "timeout": 3600,
+    "maxFailedPolls": 5
+}
+promotionEnvironments = ['dev', 'qa', 'ua']
+scaleEnvironments = ['dev', 'qa', 'ua']
+bulkPromotionEnvironments = ['DEV', 'QA', 'UA']
+fuzzyBoundaries = '/-_.'
+fuzzyRecentBoost = 40
+recentBranchesToKeep = 10
+requestStats = {}
+cacheStats = {}
+statsLock = threading.Lock()
+latencyBucketsMillis = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+endpointJobPattern = re.compile(r'job/[^/]+')
+endpointNumberPattern = re.compile(r'/\d+(?=/|$)')
+completedRunStatuses = ['SUCCESS', 'FAILED', 'ABORTED', 'UNSTABLE']
+runCache = None
+runCacheLock = threading.Lock()
+defaultConsoleSettings = {
+    "streamChunkSize": 65536,
+    "tailMinInterval": 1,
+    "tailMaxInterval": 15
+}
+defaultArchiveSettings = {
+    "enabled": True,
+    "directory": "jenkins_logs",
+    "compress": False,
+    "maxBytes": 2147483648
+}
+archiveLock = threading.Lock()
+defaultRenderSettings = {
+    "pager": "auto",
+    "writeBlockLines": 4096,
+    "pagerWindowLines": 20000
+}
+headerFormats = {
+    "job": {
+        "formatting": "{d[0]:<21} {d[1]:<25}",
+        "items": ['Job', 'Status']
+    },
+    "stage": {
+        "formatting": "{d[0]:<46} {d[1]:<23} {d[2]:>14}",
+        "items": ['Name', 'Status', 'Duration']
+    },
+    "commit": {
+        "formatting": "{d[0]:<38} {d[1]:<33} {d[2]:<60}",
+        "items": ['Date', 'Author', 'Commit Message']
+    }
+}
+renderedHeaders = {}
+runJobFormat = "{:<8} {:<15}"
+runStageFormat = "{:<33} {:<10} {:>8}\n"
+runCommitFormat = "{:<25} {:<20} {:<60}\n"
+runSeparatorLine = "{:=^70}\n".format('')
+runSectionLine = "{:-^70}\n".format('')
+runStageSectionLine = "{:-^60}\n".format('')
+ansiPattern = re.compile(r'(\x1b\[[0-9;?]*[A-Za-z])')
+pagerAnsiColors = OrderedDict([('31', 'COLOR_RED'), ('32', 'COLOR_GREEN'), ('33', 'COLOR_YELLOW'), ('34', 'COLOR_BLUE'), ('36', 'COLOR_CYAN'), ('37', 'COLOR_WHITE'), ('91', 'COLOR_RED'), ('92', 'COLOR_GREEN'), ('93', 'COLOR_YELLOW')])
+archiveLinesPerBlock = 4096
+defaultErrorPatterns = [
+    {"category": "ERROR", "contains": "ERROR:"},
+    {"category": "java.lang.Exception", "contains": "java.lang.Exception:"},
+    {"category": "ABORTED", "contains": "ABORTED"},
+    {"category": "exit code 143", "contains": "exit code 143", "pattern": "script\\sreturned\\sexit\\scode\\s143"}
+]
+compiledErrorPatterns = None
+defaultDiffSettings = {
+    "filterBytes": 16777216,
+    "hashFunctions": 4,
+    "lineCacheSize": 100000,
+    "maxLines": 2000
+}
+# Parts of console lines which differ between runs without meaning anything
+defaultDiffNormalizePatterns = [
+    {"pattern": "\\d{4}-\\d{2}-\\d{2}[T ]\\d{2}:\\d{2}:\\d{2}(?:[.,]\\d+)?(?:Z|[+-]\\d{2}:?\\d{2})?", "replacement": "<time>"},
+    {"pattern": "\\d{1,2}:\\d{2}:\\d{2}(?:[.,]\\d+)?", "replacement": "<time>"},
+    {"pattern": "[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}", "replacement": "<uuid>"},
+    {"pattern": "-[a-z0-9]{8,10}-[a-z0-9]{5}\\b", "replacement": "-<pod>"},
+    {"pattern": "\\b(?:\\d+[a-fA-F]|[a-fA-F]+\\d)[0-9a-fA-F]{3,62}\\b", "replacement": "<hash>"},
+    {"pattern": "\\d+(?:\\.\\d+)? ?(?:ms|sec|s|seconds|min)\\b", "replacement": "<duration>"}
+]
+# Timestamper prefix, stripped before lines are looked up in the line cache
+diffLeadingTimePattern = re.compile(r'\[?\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\]? ?')
+compiledDiffNormalizePatterns = None
+defaultHistorySettings = {
+    "runs": 100,
+    "pageSize": 50,
+    "workers": 8,
+    "recentRuns": 10,
+    "regressionThreshold": 0.2,
+    "regressionMinSeconds": 30
+}
+# Runs whose stage durations are final and can be kept in the history cache
+historyRunStatuses = ['SUCCESS', 'FAILED', 'ABORTED', 'UNSTABLE']
+defaultDaemonSettings = {
+    "enabled": True,
+    "socketPath": "jenkins_daemon.sock",
+    "prefetchInterval": 30,
+    "maxAge": 60,
+    "activeMaxAge": 5,
+    "prefetchRepos": 5,
+    "branchesPerRepo": 2,
+    "prefetchWorkers": 2,
+    "crumbRefreshInterval": 1800,
+    "clientTimeout": 30
+}
 
 def loadConfig(jsonFilePath):
     """Load config.json
@@ -37,32 +226,239 @@ def loadConfig(jsonFilePath):
     """
     # Opening JSON file
     config = open(jsonFilePath)
-    data = json.load(config, object_pairs_hook=OrderedDict)
+    # Plain dicts keep key order, object_pairs_hook is slower to parse
+    data = json.load(config)
     # Closing file
     config.close()
     return data
 
+def getStateFilePath():
+    return os.path.join(os.path.dirname(os.path.abspath(configFile)), stateFile)
+
+def loadState(config, withUserInfo=True):
+    """Merge saved state into config
+
+    Values from jenkins.json are kept for anything which is not saved yet so
+    existing repoBranches and previousJobRun act as defaults
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    withUserInfo : bool
+        Also apply saved user information, the prefetch daemon keeps its own crumb
+
+    Returns
+    -------
+    dict
+        config json object with state applied
+    """
+    stateFilePath = getStateFilePath()
+    if not os.path.exists(stateFilePath):
+        return config
+    try:
+        with open(stateFilePath) as stateJson:
+            state = json.load(stateJson)
+    except ValueError:
+        print(colored("Ignoring unreadable state file {}".format(stateFilePath), 'yellow'))
+        return config
+    for stateKey in stateKeys:
+        if stateKey in state:
+            config[stateKey] = state[stateKey]
+    if not withUserInfo:
+        return config
+    for userInfoKey in stateUserInfoKeys:
+        if userInfoKey in state.get('userInfo', {}):
+            config['userInfo'][userInfoKey] = state['userInfo'][userInfoKey]
+    return config
+
+def buildState(config):
+    state = OrderedDict()
+    state['userInfo'] = OrderedDict((userInfoKey, config['userInfo'].get(userInfoKey, '')) for userInfoKey in stateUserInfoKeys)
+    for stateKey in stateKeys:
+        if stateKey in config:
+            state[stateKey] = config[stateKey]
+    return state
+
+def writeJsonAtomic(filePath, data):
+    # Write next to the file and rename so a crash never leaves a truncated file
+    jsonText = json.dumps(data, separators=(',', ':'))
+    fileDescriptor, tempFilePath = tempfile.mkstemp(dir=os.path.dirname(filePath), prefix='.' + os.path.basename(filePath) + '.')
+    try:
+        with os.fdopen(fileDescriptor, 'w') as tempFile:
+            tempFile.write(jsonText)
+            tempFile.flush()
+            os.fsync(tempFile.fileno())
+        os.replace(tempFilePath, filePath)
+    except:
+        if os.path.exists(tempFilePath):
+            os.remove(tempFilePath)
+        raise
+
+def writeState(config):
+    writeJsonAtomic(getStateFilePath(), buildState(config))
+
+def flushState():
+    global stateFlushTimer
+    global pendingStateConfig
+    with configLock:
+        if stateFlushTimer is not None:
+            stateFlushTimer.cancel()
+            stateFlushTimer = None
+        if pendingStateConfig is None:
+            return
+        try:
+            writeState(pendingStateConfig)
+            pendingStateConfig = None
+        except OSError as e:
+            print(colored("Could not save state: {}".format(e), 'red'))
+
 def updateConfig(config):
-    ## Save our changes to JSON file
-    jsonFile = open(configFile, "w+")
-    jsonFile.write(json.dumps(config, indent=4))
-    jsonFile.close()
+    ## Schedule saving our changes, saves within stateFlushDelay are written once
+    global stateFlushTimer
+    global pendingStateConfig
+    with configLock:
+        pendingStateConfig = config
+        if stateFlushTimer is None:
+            stateFlushTimer = threading.Timer(stateFlushDelay, flushState)
+            stateFlushTimer.daemon = True
+            stateFlushTimer.start()
+
+# Pending changes are written when the script exits
+atexit.register(flushState)
 
 def saveCurrentJobRuns(config, pipeLineName, repoName, branchName, branchOption):
-    config["previousJobRun"]["pipeLineName"] = pipeLineName
-    config["previousJobRun"]["branchName"] = branchName
-    config["previousJobRun"]["branchOption"] = branchOption
-    config["previousJobRun"]["repoName"] = repoName
-    updateConfig(config)
+    with configLock:
+        config["previousJobRun"]["pipeLineName"] = pipeLineName
+        config["previousJobRun"]["branchName"] = branchName
+        config["previousJobRun"]["branchOption"] = branchOption
+        config["previousJobRun"]["repoName"] = repoName
+        # Most recent first, used to rank branches in branch picker
+        recentBranches = [branchOption] + [recentBranch for recentBranch in getRecentBranches(config, repoName) if recentBranch != branchOption]
+        config.setdefault("recentBranches", {})[repoName] = recentBranches[:recentBranchesToKeep]
+        # Selection counts rank repos prefetched by the daemon
+        repoUsage = config.setdefault("repoUsage", {})
+        repoUsage[repoName] = repoUsage.get(repoName, 0) + 1
+        updateConfig(config)
 
 def saveUserAuthToken(config, crumb):
-    config["userInfo"]["crumb"] = crumb
-    updateConfig(config)
+    with configLock:
+        config["userInfo"]["crumb"] = crumb
+        updateConfig(config)
+    updateSessionCrumb(crumb)
 
 def saveUserInfo(config, fullName, email):
-    config["userInfo"]["userName"] = fullName
-    config["userInfo"]["email"] = email
-    updateConfig(config)
+    with configLock:
+        config["userInfo"]["userName"] = fullName
+        config["userInfo"]["email"] = email
+        updateConfig(config)
+
+def getCacheSettings(config):
+    cacheSettings = dict(defaultCacheSettings)
+    cacheSettings.update(config.get('cacheSettings', {}))
+    return cacheSettings
+
+def getRunCache(config):
+    """Open local cache of completed runs
+
+    Completed runs never change so their processed information (stages and
+    change sets) is kept in a sqlite database next to the config file and
+    served from there instead of jenkins
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+
+    Returns
+    -------
+    sqlite3.Connection
+        cache connection or None when cache is disabled or not available
+    """
+    global runCache
+    cacheSettings = getCacheSettings(config)
+    if not cacheSettings['enabled']:
+        return None
+    if runCache is None:
+        import sqlite3
+        cacheFile = os.path.join(os.path.dirname(os.path.abspath(configFile)), cacheSettings['runCacheFile'])
+        try:
+            # Connection is shared between change set threads, access is serialised with runCacheLock
+            runCache = sqlite3.connect(cacheFile, check_same_thread=False)
+            runCache.execute("""CREATE TABLE IF NOT EXISTS runs (
+                pipeLineName TEXT NOT NULL,
+                branchName TEXT NOT NULL,
+                runId TEXT NOT NULL,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                lastAccess REAL NOT NULL,
+                PRIMARY KEY (pipeLineName, branchName, runId)
+            )""")
+            stageRunColumns = [column[1] for column in runCache.execute("PRAGMA table_info(stageRuns)")]
+            if stageRunColumns and 'lastAccess' not in stageRunColumns:
+                # Stage runs cached without size are dropped and fetched again
+                runCache.execute("DROP TABLE stageRuns")
+            runCache.execute("""CREATE TABLE IF NOT EXISTS stageRuns (
+                pipeLineName TEXT NOT NULL,
+                branchName TEXT NOT NULL,
+                runId INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                lastAccess REAL NOT NULL,
+                PRIMARY KEY (pipeLineName, branchName, runId)
+            )""")
+            runCache.commit()
+        except sqlite3.Error as e:
+            print(colored("Run cache is not available: {}".format(e), 'yellow'))
+            cacheSettings['enabled'] = False
+            config.setdefault('cacheSettings', {})['enabled'] = False
+            runCache = None
+    return runCache
+
+def getCachedRun(config, pipeLineName, branchName, runId):
+    with runCacheLock:
+        cache = getRunCache(config)
+        if cache is None:
+            return None
+        row = cache.execute("SELECT data FROM runs WHERE pipeLineName = ? AND branchName = ? AND runId = ?", (pipeLineName, branchName, runId)).fetchone()
+        recordCacheLookup('runCache', row is not None)
+        if row is None:
+            return None
+        cache.execute("UPDATE runs SET lastAccess = ? WHERE pipeLineName = ? AND branchName = ? AND runId = ?", (time.time(), pipeLineName, branchName, runId))
+        cache.commit()
+        return json.loads(row[0])
+
+def saveCachedRun(config, pipeLineName, branchName, runId, runInfo):
+    data = json.dumps(runInfo, separators=(',', ':'))
+    with runCacheLock:
+        cache = getRunCache(config)
+        if cache is None:
+            return
+        cache.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)", (pipeLineName, branchName, runId, data, len(data), time.time()))
+        cache.commit()
+
+def evictRunCache(config):
+    """Evict least recently used runs and stage runs until cache is within runCacheMaxBytes"""
+    maxBytes = getCacheSettings(config)['runCacheMaxBytes']
+    with runCacheLock:
+        cache = getRunCache(config)
+        if cache is None:
+            return
+        totalSize = cache.execute("SELECT (SELECT COALESCE(SUM(size), 0) FROM runs) + (SELECT COALESCE(SUM(size), 0) FROM stageRuns)").fetchone()[0]
+        if totalSize <= maxBytes:
+            return
+        evictKeys = {'runs': [], 'stageRuns': []}
+        cachedRows = cache.execute("""SELECT 'runs', pipeLineName, branchName, runId, size, lastAccess FROM runs
+            UNION ALL SELECT 'stageRuns', pipeLineName, branchName, runId, size, lastAccess FROM stageRuns
+            ORDER BY lastAccess""")
+        for table, pipeLine, branch, runId, size, lastAccess in cachedRows:
+            if totalSize <= maxBytes:
+                break
+            evictKeys[table].append((pipeLine, branch, runId))
+            totalSize -= size
+        for table, keys in evictKeys.items():
+            cache.executemany("DELETE FROM {} WHERE pipeLineName = ? AND branchName = ? AND runId = ?".format(table), keys)
+        cache.commit()
 
 def getListItemByName(items, name):
     for tupleItem in items:
@@ -73,14 +469,24 @@ def getListItemByName(items, name):
                 return tupleValue
             return tupleValue
 
-def processRun(runItem):
+def processRun(config, runItem, pipeLineName, branchName):
     runInfo = {}
     # print(runItem)
     jobId = getListItemByName(runItem, 'id')
-    commits = getRunChangeSets(config, pipeLineName, branchOption, jobId)
-    # print(commits)
     name = getListItemByName(runItem, 'name')
     status = getListItemByName(runItem, 'status')
+    cacheable = status in completedRunStatuses
+    if cacheable:
+        cachedRun = getCachedRun(config, pipeLineName, branchName, jobId)
+        if cachedRun is not None:
+            return cachedRun
+    try:
+        commits = fetchRunChangeSets(config, pipeLineName, branchName, jobId)
+    except:
+        print("{}: {}".format(colored("An error occurred while getting change sets for job", 'red'), colored(jobId, 'red')))
+        commits = []
+        cacheable = False
+    # print(commits)
     stages = getListItemByName(runItem, 'stages')
     runInfo['name'] = name
     runInfo['status'] = status
@@ -101,6 +507,8 @@ def processRun(runItem):
         stageInfo['stageStatus'] = stageStatus
         stageInfo['stageDuration'] = stageDurationHumanRedable
         runInfo['stages'].append(stageInfo)
+    if cacheable:
+        saveCachedRun(config, pipeLineName, branchName, jobId, runInfo)
     return runInfo
 
 def getStatusColor(status):
@@ -118,287 +526,2594 @@ def getStatusColor(status):
 def getHeaderText(text):
     return colored(text, 'white', attrs=['bold'])
 
-def getHeaders(headerName):
-    headers = {
-        "job": {
-            "formatting": "{d[0]:<21} {d[1]:<25}",
-            "items": ['Job', 'Status']
-        },
-        "stage": {
-            "formatting": "{d[0]:<46} {d[1]:<23} {d[2]:>14}",
-            "items": ['Name', 'Status', 'Duration']
-        },
-        "commit": {
-            "formatting": "{d[0]:<38} {d[1]:<33} {d[2]:<60}",
-            "items": ['Date', 'Author', 'Commit Message']
-        }
-    }
-    appliedFormat = headers[headerName]['formatting']
-    # print(appliedFormat)
-    appliedItems = headers[headerName]['items']
-    formattedItems = []
-    for i in appliedItems:
-        formattedItems.append(getHeaderText(i))
-    # print(formattedItems)
-    print(appliedFormat.format(d=formattedItems))
+def getHeaderLine(headerName):
+    # Header lines never change, they are formatted once per process
+    if headerName not in renderedHeaders:
+        headerFormat = headerFormats[headerName]
+        renderedHeaders[headerName] = headerFormat['formatting'].format(d=[getHeaderText(item) for item in headerFormat['items']])
+    return renderedHeaders[headerName]
 
-def printRun(runItem):
+def renderRun(runItem):
+    """Render a run into a single string
+
+    Parameters
+    ----------
+    runItem : dict
+        Processed run from processRun
+
+    Returns
+    -------
+    str
+        run text, same as printed by printRun
+    """
     name = runItem['name']
     status = runItem['status']
     stages = runItem['stages']
     commits = runItem['commits']
-    jobItemFormat = "{:<8} {:<15}"
-    stageItemFormat = "{:<33} {:<10} {:>8}"
-    commitItemFormat = "{:<25} {:<20} {:<60}"
-    # print(name, status)
-    # print(type(stages))
-    print('\n')
-    print("{:=^70}".format(''))
-    getHeaders('job')
-    print (jobItemFormat.format(name, getStatusColor(status)))
-    print("{:-^70}".format(''))
-    getHeaders('commit')
-    for commitIndex, commitValue in enumerate(commits):
-        commitItem = commits[commitIndex]
-        # print(commitItem)
-        commitMsg = commitItem['msg']
+    buffer = ['\n\n', runSeparatorLine, getHeaderLine('job'), '\n', runJobFormat.format(name, getStatusColor(status)), '\n', runSectionLine, getHeaderLine('commit'), '\n']
+    for commitItem in commits:
         commitDate = int(commitItem['timestamp'])/1000
         dateObject = datetime.fromtimestamp(commitDate).strftime('%b %d %Y %I:%M:%S %p')
-        # print(dateObject)
-        commitAuthor = commitItem['author']
-        print (commitItemFormat.format(dateObject, commitAuthor, commitMsg))
-
-    print("{:-^60}".format(''))
-    getHeaders('stage')
-    for stageIndex, stageValue in enumerate(stages):
-        stageItem = stages[stageIndex]
-        # print(stageItem)
-        stageName = stageItem['stageName']
-        stageStatus = stageItem['stageStatus']
-        stageDuration = stageItem['stageDuration']
-        print (stageItemFormat.format(stageName, getStatusColor(stageStatus), stageDuration))
+        buffer.append(runCommitFormat.format(dateObject, commitItem['author'], commitItem['msg']))
+    buffer.append(runStageSectionLine)
+    buffer.append(getHeaderLine('stage'))
+    buffer.append('\n')
+    for stageItem in stages:
+        buffer.append(runStageFormat.format(stageItem['stageName'], getStatusColor(stageItem['stageStatus']), stageItem['stageDuration']))
+    return ''.join(buffer)
+
+def printRun(runItem):
+    writeOutput(renderRun(runItem))
+
+def writeOutput(text):
+    # One write and flush per rendered block instead of a print per line
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+def getRenderSettings(config):
+    renderSettings = dict(defaultRenderSettings)
+    renderSettings.update(config.get('renderSettings', {}))
+    return renderSettings
+
+class LazyLines:
+    """Lines of an iterator loaded only as far as they are read
+
+    Gives iterators (Ex. a streamed console) the interface of ArchivedLog
+    so both can be paged. With reopen only a window of windowLines lines is
+    kept, lines before the window are read again from reopen(startLine)
+    """
+
+    def __init__(self, lines, reopen=None, windowLines=None):
+        self.lines = iter(lines)
+        self.reopen = reopen
+        self.windowLines = windowLines if reopen is not None else None
+        self.loadedLines = []
+        self.firstLoadedLine = 1
+        self.totalLines = None
+        self.complete = False
+
+    def load(self, count):
+        # Load until line count is available or lines are exhausted
+        while not self.complete and self.firstLoadedLine - 1 + len(self.loadedLines) < count:
+            try:
+                self.loadedLines.append(next(self.lines))
+            except StopIteration:
+                self.complete = True
+                self.totalLines = self.firstLoadedLine - 1 + len(self.loadedLines)
+                break
+            if self.windowLines is not None and len(self.loadedLines) >= 2 * self.windowLines:
+                # Drop lines before the window in one go instead of on every line
+                dropCount = len(self.loadedLines) - self.windowLines
+                del self.loadedLines[:dropCount]
+                self.firstLoadedLine += dropCount
+
+    def rewind(self, startLine):
+        if hasattr(self.lines, 'close'):
+            self.lines.close()
+        self.lines = iter(self.reopen(startLine))
+        self.loadedLines = []
+        self.firstLoadedLine = startLine
+        self.complete = False
+
+    def lineCount(self, loadAll=False):
+        if loadAll:
+            self.load(float('inf'))
+        return self.totalLines
+
+    def hasMoreThan(self, count):
+        if self.totalLines is not None:
+            return self.totalLines > count
+        self.load(count + 1)
+        return self.firstLoadedLine - 1 + len(self.loadedLines) > count
+
+    def getLines(self, startLine, lineCount):
+        if startLine < self.firstLoadedLine:
+            self.rewind(startLine)
+        self.load(startLine - 1 + lineCount)
+        windowStart = startLine - self.firstLoadedLine
+        return self.loadedLines[windowStart:windowStart + lineCount]
+
+    def iterLines(self, startLine=1, lineCount=None):
+        lineNumber = startLine
+        while lineCount is None or lineNumber < startLine + lineCount:
+            if lineNumber < self.firstLoadedLine:
+                self.rewind(lineNumber)
+            self.load(lineNumber)
+            if lineNumber >= self.firstLoadedLine + len(self.loadedLines):
+                return
+            yield self.loadedLines[lineNumber - self.firstLoadedLine]
+            lineNumber += 1
+
+    def drain(self):
+        """Iterate over all lines without keeping the ones not loaded yet"""
+        if self.firstLoadedLine > 1:
+            self.rewind(1)
+        yield from self.loadedLines
+        self.loadedLines = []
+        yield from self.lines
+        self.complete = True
+
+def shouldPage(config, lineSource):
+    pagerMode = getRenderSettings(config)['pager']
+    if pagerMode == 'never' or not sys.stdout.isatty() or not sys.stdin.isatty():
+        return False
+    if pagerMode == 'always':
+        return True
+    visibleRows = shutil.get_terminal_size().lines - 1
+    if isinstance(lineSource, LazyLines):
+        return lineSource.hasMoreThan(visibleRows)
+    return lineSource.lineCount() > visibleRows
+
+def showLines(config, lineSource, title):
+    """Show lines in the built in pager or write them in blocks
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    lineSource : LazyLines or ArchivedLog
+        Lines to show
+    title : str
+        Shown in the pager status line
+    """
+    if shouldPage(config, lineSource):
+        import curses
+        curses.wrapper(runPager, lineSource, title)
+        return
+    lines = lineSource.drain() if isinstance(lineSource, LazyLines) else lineSource.iterLines()
+    blockLines = getRenderSettings(config)['writeBlockLines']
+    while True:
+        block = list(islice(lines, blockLines))
+        if not block:
+            return
+        writeOutput('\n'.join(block) + '\n')
+
+def getPagerColors():
+    """Map ansi codes written by termcolor to curses attributes"""
+    import curses
+    pagerColors = {'0': 0, '1': curses.A_BOLD}
+    if not curses.has_colors():
+        return pagerColors
+    for pairNumber, (ansiCode, cursesColor) in enumerate(pagerAnsiColors.items(), 1):
+        try:
+            curses.init_pair(pairNumber, getattr(curses, cursesColor), -1)
+            pagerColors[ansiCode] = curses.color_pair(pairNumber)
+        except curses.error:
+            pass
+    return pagerColors
+
+def drawPagerLine(screen, row, line, maxX, pagerColors):
+    import curses
+    column = 0
+    attributes = 0
+    for part in ansiPattern.split(line.expandtabs(8)):
+        if ansiPattern.fullmatch(part):
+            # Only select graphic rendition codes change attributes, others are dropped
+            if part.endswith('m'):
+                for code in (part[2:-1] or '0').split(';'):
+                    attributes = 0 if code == '0' else attributes | pagerColors.get(code, 0)
+            continue
+        if column >= maxX - 1 or not part:
+            continue
+        text = part[:maxX - 1 - column]
+        try:
+            screen.addstr(row, column, text, attributes)
+        except curses.error:
+            pass
+        column += len(text)
+
+def promptPager(screen, prompt):
+    import curses
+    maxY, maxX = screen.getmaxyx()
+    screen.move(maxY - 1, 0)
+    screen.clrtoeol()
+    screen.addnstr(maxY - 1, 0, prompt, maxX - 1)
+    curses.echo()
+    try:
+        curses.curs_set(1)
+    except curses.error:
+        pass
+    try:
+        return screen.getstr(maxY - 1, len(prompt)).decode('utf-8', errors='replace')
+    finally:
+        curses.noecho()
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+
+def searchPagerLines(lineSource, pattern, startLine):
+    for lineNumber, line in enumerate(lineSource.iterLines(startLine), startLine):
+        if pattern.search(ansiPattern.sub('', line)):
+            return lineNumber
+    return None
+
+def runPager(screen, lineSource, title):
+    """Page through lines drawing only the visible window
+
+    Lines are requested from lineSource for the visible window only, an
+    ArchivedLog reads them from its mapped file and LazyLines loads them
+    from its iterator when they are scrolled to
+    """
+    import curses
+    try:
+        curses.use_default_colors()
+        curses.curs_set(0)
+    except curses.error:
+        pass
+    pagerColors = getPagerColors()
+    topLine = 1
+    searchPattern = None
+    message = ''
+    while True:
+        screen.erase()
+        maxY, maxX = screen.getmaxyx()
+        visibleRows = max(1, maxY - 1)
+        visibleLines = lineSource.getLines(topLine, visibleRows)
+        for row, line in enumerate(visibleLines):
+            drawPagerLine(screen, row, line, maxX, pagerColors)
+        lineCount = lineSource.lineCount()
+        position = "lines {}-{} of {}".format(topLine, topLine + len(visibleLines) - 1, lineCount if lineCount is not None else '?')
+        status = message or "{}  {}  (q quit, arrows/space/b scroll, g/G top/bottom, :line, /search, n next)".format(title, position)
+        try:
+            screen.addnstr(maxY - 1, 0, status, maxX - 1, curses.A_REVERSE)
+        except curses.error:
+            pass
+        screen.refresh()
+        message = ''
+
+        key = screen.getch()
+        if key in (ord('q'), 27):
+            return
+        elif key in (curses.KEY_DOWN, ord('j'), ord('\n')):
+            topLine += 1
+        elif key in (curses.KEY_UP, ord('k')):
+            topLine -= 1
+        elif key in (curses.KEY_NPAGE, ord(' ')):
+            topLine += visibleRows
+        elif key in (curses.KEY_PPAGE, ord('b')):
+            topLine -= visibleRows
+        elif key in (curses.KEY_HOME, ord('g')):
+            topLine = 1
+        elif key in (curses.KEY_END, ord('G')):
+            lineCount = lineSource.lineCount(True) if isinstance(lineSource, LazyLines) else lineSource.lineCount()
+            topLine = lineCount - visibleRows + 1
+        elif key == ord(':'):
+            lineNumber = promptPager(screen, ':')
+            if lineNumber.strip().isdigit():
+                topLine = int(lineNumber)
+        elif key in (ord('/'), ord('n')):
+            if key == ord('/'):
+                patternText = promptPager(screen, '/')
+                try:
+                    searchPattern = re.compile(patternText) if patternText else searchPattern
+                except re.error as e:
+                    message = "Invalid regular expression: {}".format(e)
+                    continue
+            if searchPattern is None:
+                continue
+            matchLine = searchPagerLines(lineSource, searchPattern, topLine + 1)
+            if matchLine is None:
+                message = "Pattern not found: {}".format(searchPattern.pattern)
+            else:
+                topLine = matchLine
+        # Keep window on existing lines, a LazyLines count is known once it is read to the end
+        lineCount = lineSource.lineCount()
+        if lineCount is not None:
+            topLine = min(topLine, max(1, lineCount - visibleRows + 1))
+        elif not lineSource.getLines(topLine, 1):
+            topLine = max(1, (lineSource.lineCount() or 1) - visibleRows + 1)
+        topLine = max(1, topLine)
 
 def mil_convert(milliseconds):
    seconds, milliseconds = divmod(milliseconds, 1000)
    minutes, seconds = divmod(seconds, 60)
    return minutes, seconds
     
-def makeRequest(urlPath, httpMethod, config):
+def getHttpSettings(config):
+    httpSettings = dict(defaultHttpSettings)
+    httpSettings.update(config.get('httpSettings', {}))
+    return httpSettings
+
+def getSession(config, retry=True):
+    """Get shared http session
+
+    Sessions are created once per process and reused for every request so that
+    connections to jenkins are pooled and kept alive instead of doing a new
+    TCP and TLS handshake per call.
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    retry : bool
+        Whether requests on this session are retried on connection errors and
+        5xx responses. Build triggers use a session without retries so a job
+        is never started twice
+
+    Returns
+    -------
+    requests.Session
+        pooled session with auth and crumb header applied
+    """
+    sessionKey = 'retry' if retry else 'noRetry'
+    if sessionKey in httpSessions:
+        return httpSessions[sessionKey]
+    importStartTime = time.perf_counter()
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    startupTimings.setdefault('network imports (first request)', time.perf_counter() - importStartTime)
+    httpSettings = getHttpSettings(config)
+    userInfo = config['userInfo']
+    if retry:
+        maxRetries = Retry(
+            total=httpSettings['retries'],
+            connect=httpSettings['retries'],
+            read=httpSettings['retries'],
+            status=httpSettings['retries'],
+            backoff_factor=httpSettings['backoffFactor'],
+            status_forcelist=httpSettings['retryStatusCodes'],
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False
+        )
+    else:
+        maxRetries = Retry(total=0, connect=0, read=0, status=0, raise_on_status=False)
+    adapter = HTTPAdapter(
+        pool_connections=httpSettings['poolConnections'],
+        pool_maxsize=httpSettings['poolMaxSize'],
+        max_retries=maxRetries
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.auth = (userInfo['objectId'], userInfo['appToken'])
+    if userInfo['crumb']:
+        session.headers["Jenkins-Crumb"] = "{}".format(userInfo['crumb'])
+    httpSessions[sessionKey] = session
+    return session
+
+def updateSessionCrumb(crumb):
+    for session in httpSessions.values():
+        session.headers["Jenkins-Crumb"] = "{}".format(crumb)
+
+def getRequestTimeout(config):
+    httpSettings = getHttpSettings(config)
+    return (httpSettings['connectTimeout'], httpSettings['readTimeout'])
+
+def processResponse(response):
+    if 'content-type' in response.headers:
+        contentType = response.headers['content-type']
+        if contentType == 'text/plain;charset=utf-8':
+            return response.text
+        elif contentType == 'application/json;charset=utf-8':
+            return response.json()
+    return response
+
+def buildTree(fields):
+    """Build jenkins tree expression from field list
+
+    Parameters
+    ----------
+    fields : list
+        Field names, nested fields are given as {name: [sub fields]}
+
+    Returns
+    -------
+    str
+        tree expression, Ex. changeSets[items[msg,author[fullName]]]
+    """
+    treeItems = []
+    for field in fields:
+        if isinstance(field, dict):
+            for fieldName, subFields in field.items():
+                treeItems.append("{}[{}]".format(fieldName, buildTree(subFields)))
+        else:
+            treeItems.append(field)
+    return ','.join(treeItems)
+
+def buildApiUrl(urlPath, fieldsName):
+    return urlPath + "?tree=" + urllib.parse.quote(buildTree(apiFields[fieldsName]), safe=',[]')
+
+def getEndpointName(httpMethod, urlPath):
+    # Job names and run numbers are folded so calls group per api endpoint
+    path = urlPath.split('?')[0]
+    path = endpointJobPattern.sub('job/*', path)
+    path = endpointNumberPattern.sub('/<n>', path)
+    return "{} {}".format(httpMethod.upper(), path)
+
+def getEndpointStats(endpoint):
+    if endpoint not in requestStats:
+        requestStats[endpoint] = {
+            'count': 0,
+            'errors': 0,
+            'retries': 0,
+            'bytes': 0,
+            'totalSeconds': 0.0,
+            'maxSeconds': 0.0,
+            'statusCodes': {},
+            'latencyBuckets': [0] * (len(latencyBucketsMillis) + 1)
+        }
+    return requestStats[endpoint]
+
+def recordRequest(endpoint, seconds, statusCode, retries):
+    with statsLock:
+        endpointStats = getEndpointStats(endpoint)
+        endpointStats['count'] += 1
+        endpointStats['retries'] += retries
+        endpointStats['totalSeconds'] += seconds
+        endpointStats['maxSeconds'] = max(endpointStats['maxSeconds'], seconds)
+        statusKey = str(statusCode) if statusCode is not None else 'error'
+        endpointStats['statusCodes'][statusKey] = endpointStats['statusCodes'].get(statusKey, 0) + 1
+        if statusCode is None or statusCode >= 400:
+            endpointStats['errors'] += 1
+        bucketIndex = len(latencyBucketsMillis)
+        for index, bucketMillis in enumerate(latencyBucketsMillis):
+            if seconds * 1000 <= bucketMillis:
+                bucketIndex = index
+                break
+        endpointStats['latencyBuckets'][bucketIndex] += 1
+
+def recordResponseBytes(endpoint, byteCount):
+    with statsLock:
+        getEndpointStats(endpoint)['bytes'] += byteCount
+
+def recordCacheLookup(cacheName, hit):
+    with statsLock:
+        lookupStats = cacheStats.setdefault(cacheName, {'hit': 0, 'miss': 0})
+        lookupStats['hit' if hit else 'miss'] += 1
+
+def getLatencyPercentile(latencyBuckets, percentile):
+    # Upper bound of the bucket holding the percentile, None for the open ended bucket
+    count = sum(latencyBuckets)
+    if count == 0:
+        return None
+    threshold = count * percentile / 100.0
+    runningCount = 0
+    for index, bucketCount in enumerate(latencyBuckets):
+        runningCount += bucketCount
+        if runningCount >= threshold:
+            return latencyBucketsMillis[index] if index < len(latencyBucketsMillis) else None
+    return None
+
+def buildStatsReport():
+    with statsLock:
+        endpoints = OrderedDict()
+        for endpoint, endpointStats in sorted(requestStats.items(), key=lambda item: -item[1]['totalSeconds']):
+            endpointReport = dict(endpointStats)
+            endpointReport['statusCodes'] = dict(endpointStats['statusCodes'])
+            endpointReport['latencyBuckets'] = OrderedDict()
+            for index, bucketCount in enumerate(endpointStats['latencyBuckets']):
+                bucketName = "<={}ms".format(latencyBucketsMillis[index]) if index < len(latencyBucketsMillis) else ">{}ms".format(latencyBucketsMillis[-1])
+                endpointReport['latencyBuckets'][bucketName] = bucketCount
+            endpointReport['p50Millis'] = getLatencyPercentile(endpointStats['latencyBuckets'], 50)
+            endpointReport['p95Millis'] = getLatencyPercentile(endpointStats['latencyBuckets'], 95)
+            endpoints[endpoint] = endpointReport
+        caches = {cacheName: dict(lookupStats) for cacheName, lookupStats in cacheStats.items()}
+    statsReport = {'endpoints': endpoints, 'caches': caches}
+    if requestScheduler is not None:
+        statsReport['scheduler'] = requestScheduler.getReport()
+    return statsReport
+
+def printStatsReport():
+    statsReport = buildStatsReport()
+    statsFormat = "{:<55} {:>6} {:>6} {:>7} {:>9} {:>8} {:>8} {:>8} {:>11}"
+    print("\nRequest stats", file=sys.stderr)
+    print(statsFormat.format('Endpoint', 'Count', 'Errors', 'Retries', 'Total', 'Avg', 'p95', 'Max', 'Bytes'), file=sys.stderr)
+    for endpoint, endpointReport in statsReport['endpoints'].items():
+        averageSeconds = endpointReport['totalSeconds'] / endpointReport['count'] if endpointReport['count'] else 0
+        p95Text = "<={}ms".format(endpointReport['p95Millis']) if endpointReport['p95Millis'] is not None else '>{}ms'.format(latencyBucketsMillis[-1])
+        print(statsFormat.format(
+            endpoint[:55], endpointReport['count'], endpointReport['errors'], endpointReport['retries'],
+            "{:.2f}s".format(endpointReport['totalSeconds']), "{:.0f}ms".format(averageSeconds * 1000), p95Text,
+            "{:.0f}ms".format(endpointReport['maxSeconds'] * 1000), endpointReport['bytes']
+        ), file=sys.stderr)
+        histogramText = ' '.join("{}:{}".format(bucketName, bucketCount) for bucketName, bucketCount in endpointReport['latencyBuckets'].items() if bucketCount)
+        print("    {}".format(histogramText), file=sys.stderr)
+    if statsReport['caches']:
+        print("Cache stats", file=sys.stderr)
+        for cacheName, lookupStats in statsReport['caches'].items():
+            print("    {:<20} hit {:>6} miss {:>6}".format(cacheName, lookupStats['hit'], lookupStats['miss']), file=sys.stderr)
+    if 'scheduler' in statsReport:
+        schedulerReport = statsReport['scheduler']
+        print("Rate limit", file=sys.stderr)
+        print("    {} requests/s, throttled {}, waited {:.2f}s".format(schedulerReport['requestsPerSecond'], schedulerReport['throttled'], schedulerReport['waitSeconds']), file=sys.stderr)
+
+def writeStatsJson(statsFilePath):
+    with open(statsFilePath, 'w') as statsFile:
+        json.dump(buildStatsReport(), statsFile, indent=4)
+
+def getSchedulerSettings(config):
+    schedulerSettings = dict(defaultSchedulerSettings)
+    schedulerSettings.update(config.get('schedulerSettings', {}))
+    return schedulerSettings
+
+class RequestScheduler:
+    """Coalesce identical requests and rate limit requests sent to jenkins
+
+    Concurrent identical reads share one network call (single flight).
+    Requests take a token from a bucket refilled at an adaptive rate: the rate
+    grows additively while jenkins answers fast and is cut multiplicatively
+    on throttling responses (429, 503) or when latency exceeds
+    latencyTargetSeconds. Retry-After of throttling responses pauses the bucket.
+    """
+
+    def __init__(self, schedulerSettings):
+        self.settings = schedulerSettings
+        self.lock = threading.Lock()
+        self.inFlight = {}
+        self.rate = float(schedulerSettings['requestsPerSecond'])
+        self.tokens = float(schedulerSettings['burst'])
+        self.lastRefill = time.monotonic()
+        self.pausedUntil = 0.0
+        self.lastDecrease = 0.0
+        self.latencyAverage = None
+        self.throttledCount = 0
+        self.waitSeconds = 0.0
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.pausedUntil:
+                    waitTime = self.pausedUntil - now
+                else:
+                    self.tokens = min(self.settings['burst'], self.tokens + (now - max(self.lastRefill, self.pausedUntil)) * self.rate)
+                    self.lastRefill = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    waitTime = (1 - self.tokens) / self.rate
+                self.waitSeconds += waitTime
+            time.sleep(waitTime)
+
+    def record(self, seconds, statusCode, retryAfter):
+        """Adapt rate to a finished request
+
+        Parameters
+        ----------
+        seconds : float
+            Request latency, None when it is not comparable (streams)
+        statusCode : int
+            Response status, None when the request failed
+        retryAfter : float
+            Seconds from Retry-After header of the response
+        """
+        settings = self.settings
+        with self.lock:
+            if statusCode in settings['throttleStatusCodes']:
+                self.throttledCount += 1
+                now = time.monotonic()
+                # Requests sent before the last cut report the same overload, cut once per second
+                if now - self.lastDecrease >= 1.0:
+                    self.lastDecrease = now
+                    self.rate = max(settings['minRequestsPerSecond'], self.rate * settings['decreaseFactor'])
+                # One request may go as soon as the pause is over
+                self.tokens = 1.0
+                self.pausedUntil = max(self.pausedUntil, now + (retryAfter or 1.0 / self.rate))
+                return
+            if seconds is None or statusCode is None:
+                return
+            self.latencyAverage = seconds if self.latencyAverage is None else self.latencyAverage * 0.8 + seconds * 0.2
+            if self.latencyAverage > settings['latencyTargetSeconds']:
+                self.rate = max(settings['minRequestsPerSecond'], self.rate * (1 - (1 - settings['decreaseFactor']) / 5))
+            else:
+                # Grows by about increaseStep per second while requests are sent at full rate
+                self.rate = min(settings['maxRequestsPerSecond'], self.rate + settings['increaseStep'] / self.rate)
+
+    def coalesce(self, requestKey, send):
+        """Run send once for concurrent calls with the same requestKey"""
+        with self.lock:
+            flight = self.inFlight.get(requestKey)
+            isLeader = flight is None
+            if isLeader:
+                flight = Future()
+                self.inFlight[requestKey] = flight
+        recordCacheLookup('singleFlight', not isLeader)
+        if not isLeader:
+            return flight.result()
+        try:
+            flight.set_result(send())
+        except BaseException as e:
+            flight.set_exception(e)
+        finally:
+            with self.lock:
+                del self.inFlight[requestKey]
+        return flight.result()
+
+    def getReport(self):
+        with self.lock:
+            return {
+                'requestsPerSecond': round(self.rate, 2),
+                'throttled': self.throttledCount,
+                'waitSeconds': round(self.waitSeconds, 3),
+                'latencyAverageSeconds': round(self.latencyAverage, 3) if self.latencyAverage is not None else None
+            }
+
+def getRequestScheduler(config):
+    global requestScheduler
+    if requestScheduler is None:
+        requestScheduler = RequestScheduler(getSchedulerSettings(config))
+    return requestScheduler
+
+def getRetryAfter(response):
+    retryAfter = response.headers.get('Retry-After', '')
+    return float(retryAfter) if retryAfter.strip().isdigit() else None
+
+def sendRequest(urlPath, httpMethod, config, retry=True, stream=False, headers=None):
+    """Send request to jenkins recording latency, status, retries and bytes
+
+    Requests go through the request scheduler. Identical reads in flight at
+    the same time are sent once and share the response, reads being requests
+    on the retrying session (several reads are sent as post, build triggers
+    use the session without retries)
+
+    Parameters
+    ----------
+    urlPath : str
+        Path relative to baseUrl
+    httpMethod : str
+        get or post
+    config : dict
+        config json object
+    retry : bool
+        Use session which retries failed requests
+    stream : bool
+        Do not read the body, bytes are recorded by the reader
+    headers : dict
+        Extra request headers
+
+    Returns
+    -------
+    requests.Response
+        response with endpointName set for stream readers
+    """
+    schedulerSettings = getSchedulerSettings(config)
+    if not schedulerSettings['enabled']:
+        return sendScheduledRequest(urlPath, httpMethod, config, retry, stream, headers, None)
+    scheduler = getRequestScheduler(config)
+    if not schedulerSettings['coalesce'] or stream or not retry:
+        return sendScheduledRequest(urlPath, httpMethod, config, retry, stream, headers, scheduler)
+    requestKey = (httpMethod.lower(), urlPath, tuple(sorted((headers or {}).items())))
+    return scheduler.coalesce(requestKey, lambda: sendScheduledRequest(urlPath, httpMethod, config, retry, stream, headers, scheduler))
+
+def sendScheduledRequest(urlPath, httpMethod, config, retry, stream, headers, scheduler):
     userInfo = config['userInfo']
     url = userInfo['baseUrl'] + urlPath
-    headers = {"Jenkins-Crumb": "{}".format(userInfo['crumb'])}
+    session = getSession(config, retry)
+    timeout = getRequestTimeout(config)
+    endpoint = getEndpointName(httpMethod, urlPath)
     # print(url)
-    # print(headers)
+    if scheduler is not None:
+        scheduler.acquire()
+    startTime = time.perf_counter()
     try:
-        if httpMethod == 'get':
-            response = requests.get(url, headers = headers, auth = (userInfo['objectId'], userInfo['appToken']))
-        elif httpMethod == 'post':
-            response = requests.post(url, headers = headers, auth = (userInfo['objectId'], userInfo['appToken']))
-        
-        if 'content-type' in response.headers:
-            contentType = response.headers['content-type']
-            if contentType == 'text/plain;charset=utf-8':
-                return response.text
-            elif contentType == 'application/json;charset=utf-8':
-                return response.json()
-        return response
-    except:
-        print("{}".format(colored("An error occurred while making web request", 'red'), 'red'))
+        response = session.request(httpMethod.upper(), url, headers = headers, timeout = timeout, stream = stream)
+        if not stream:
+            # Reading content here so latency includes the download
+            recordResponseBytes(endpoint, len(response.content))
+    except Exception:
+        recordRequest(endpoint, time.perf_counter() - startTime, None, 0)
+        if scheduler is not None:
+            scheduler.record(None, None, None)
+        raise
+    seconds = time.perf_counter() - startTime
+    retries = getattr(response.raw, 'retries', None)
+    recordRequest(endpoint, seconds, response.status_code, len(retries.history) if retries else 0)
+    if scheduler is not None:
+        # Throttling answered by retries inside the session is only visible in retry history
+        retryStatusCodes = [history.status for history in retries.history] if retries else []
+        throttleStatusCodes = [statusCode for statusCode in retryStatusCodes if statusCode in scheduler.settings['throttleStatusCodes']]
+        if throttleStatusCodes and response.status_code not in scheduler.settings['throttleStatusCodes']:
+            scheduler.record(None, throttleStatusCodes[-1], None)
+        # Streams are timed to the first byte only, not comparable to full downloads
+        scheduler.record(None if stream else seconds, response.status_code, getRetryAfter(response))
+    response.endpointName = endpoint
+    return response
+
+def makeRequest(urlPath, httpMethod, config, retry=True):
+    try:
+        response = sendRequest(urlPath, httpMethod, config, retry)
+        return processResponse(response)
+    except Exception as e:
+        print("{}: {}".format(colored("An error occurred while making web request", 'red'), e))
 
 def makeAuthRequest(urlPath, httpMethod, config):
-    userInfo = config['userInfo']
-    url = userInfo['baseUrl'] + urlPath
-    # print(url)
-    # print(headers)
     try:
-        if httpMethod == 'get':
-            response = requests.get(url, auth=HTTPBasicAuth(userInfo['objectId'], userInfo['appToken']))
-        
-        if 'content-type' in response.headers:
-            contentType = response.headers['content-type']
-            if contentType == 'text/plain;charset=utf-8':
-                return response.text
-            elif contentType == 'application/json;charset=utf-8':
-                return response.json()
-        return response
-    except:
-        print("{}".format(colored("An error occurred while making web request", 'red'), 'red'))
+        # Crumb is being issued here so a stale one must not be sent
+        response = sendRequest(urlPath, httpMethod, config, headers = {"Jenkins-Crumb": None})
+        return processResponse(response)
+    except Exception as e:
+        print("{}: {}".format(colored("An error occurred while making web request", 'red'), e))
 
-def processUserDetails(name, email):
-    print("Logged in as")
-    print("Name: {}".format(colored(name, 'green', attrs=['bold'])))
-    print("Email: {}".format(colored(email, 'green', attrs=['bold'])))
+def makeStreamRequest(urlPath, httpMethod, config):
+    try:
+        return sendRequest(urlPath, httpMethod, config, stream=True)
+    except Exception as e:
+        print("{}: {}".format(colored("An error occurred while making web request", 'red'), e))
 
-def getUserAuthToken(config):
-    tokenResponse = makeAuthRequest('crumbIssuer/api/json', 'get', config)
-    return tokenResponse['crumb']
+def iterResponseLines(response, chunkSize, archiveWriter=None):
+    """Iterate over lines of a streamed response
 
-def printUserDetails(config):
-    userDetails = makeRequest("me/api/json", "post", config)
-    email = userDetails['property'][4]['address']
-    fullName = userDetails['fullName']
-    saveUserInfo(config, fullName, email)
-    processUserDetails(fullName, email)
+    Only one chunk and a partial line are held in memory at a time
 
-def getRepositoryNames(pipeLineList):
-    repoListNames = []
-    for pipeLineItem in pipeLineList:
-        repo = pipeLineItem['repo']
-        repoListNames.append(repo)
-    return repoListNames
+    Parameters
+    ----------
+    response : requests.Response
+        Response opened with stream=True
+    chunkSize : int
+        Number of bytes read from the socket at once
+    archiveWriter : ConsoleArchiveWriter
+        Gets every chunk, committed when the whole response was read
 
-def getPipeLineInfo(pipeLineList, index, propertyName):
-    return pipeLineList[index][propertyName]
+    Returns
+    -------
+    generator
+        lines without line endings
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    try:
+        for chunk in response.iter_content(chunk_size=chunkSize):
+            recordResponseBytes(response.endpointName, len(chunk))
+            if archiveWriter is not None:
+                archiveWriter.write(chunk)
+            pending += decoder.decode(chunk)
+            lines = pending.split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip('\r')
+        if archiveWriter is not None:
+            archiveWriter.commit()
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending.rstrip('\r')
+    finally:
+        response.close()
+        if archiveWriter is not None:
+            # Stream stopped early or failed, the partial log is not kept
+            archiveWriter.discard()
 
-def getPipeLineJobs(pipeLineName, config):
-    pipeLineJobsUrl = "job/"+pipeLineName+"/api/json?tree=jobs[name]"
-    pipeLineJobsResponse = makeRequest(pipeLineJobsUrl, "post", config)
-    pipeLineJobs = pipeLineJobsResponse['jobs']
-    pipeLineJobNames = {}
-    for pipeLineJob in pipeLineJobs:
-        # print(pipeLineJob, type(pipeLineJob))
-        pipeLineJobName = pipeLineJob['name']
-        urlSafeName = urllib.parse.unquote(pipeLineJobName)
-        pipeLineJobNames[pipeLineJobName] = urlSafeName
-    return pipeLineJobNames
+def getConsoleSettings(config):
+    consoleSettings = dict(defaultConsoleSettings)
+    consoleSettings.update(config.get('consoleSettings', {}))
+    return consoleSettings
 
-def getJobRuns(config, pipeLineName, branchName):
-    jobRunsUrl = "job/"+pipeLineName+"/job/"+branchName+"/wfapi/runs"
-    jobRunsResponse = makeRequest(jobRunsUrl, "post", config)
-    # print(jobRunsResponse)
-    runsToConsider = 5
-    runsInfo = []
-    for i in islice(jobRunsResponse, 0, runsToConsider):
-        runItem = i.items()
-        processedRunItem = processRun(runItem)
-        runsInfo.append(processedRunItem)
-    
-    # Print run information
-    for idx, value in enumerate(runsInfo):
-        runItem = value
-        printRun(runItem)
+def getArchiveSettings(config):
+    archiveSettings = dict(defaultArchiveSettings)
+    archiveSettings.update(config.get('archiveSettings', {}))
+    return archiveSettings
 
-def printJobErrors(errors):
-    for error in enumerate(errors):
-        error = error[1]
-        print(colored(error, 'red'))
+def getArchiveDirectory(config):
+    return os.path.join(os.path.dirname(os.path.abspath(configFile)), getArchiveSettings(config)['directory'])
+
+class ArchivedLog:
+    """Console log of a completed build kept in the local archive
+
+    The log is memory mapped and lines are located through an index of line
+    start offsets (also memory mapped), so paging, jumping to a line and
+    searching do not load the log into memory. Compressed logs can not be
+    mapped, they are decompressed while reading.
+    """
+
+    def __init__(self, logPath, indexPath):
+        self.logPath = logPath
+        self.compressed = logPath.endswith('.gz')
+        self.logFile = open(logPath, 'rb')
+        self.indexFile = open(indexPath, 'rb')
+        self.logMap = None
+        self.indexMap = None
+        self.lineOffsets = []
+        if os.path.getsize(indexPath):
+            self.indexMap = mmap.mmap(self.indexFile.fileno(), 0, access=mmap.ACCESS_READ)
+            self.lineOffsets = memoryview(self.indexMap).cast('Q')
+        if not self.compressed and os.path.getsize(logPath):
+            self.logMap = mmap.mmap(self.logFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self.lineOffsets, memoryview):
+            self.lineOffsets.release()
+        self.lineOffsets = []
+        for mappedFile in (self.logMap, self.indexMap):
+            if mappedFile is not None:
+                mappedFile.close()
+        self.logMap = self.indexMap = None
+        self.logFile.close()
+        self.indexFile.close()
+
+    def lineCount(self):
+        return len(self.lineOffsets)
+
+    def iterLines(self, startLine=1, lineCount=None):
+        """Iterate over lines from startLine (1 based) without line endings"""
+        startIndex = max(startLine, 1) - 1
+        endIndex = self.lineCount() if lineCount is None else min(self.lineCount(), startIndex + lineCount)
+        if startIndex >= endIndex:
+            return
+        if self.logMap is not None:
+            # Lines are decoded in blocks, splitting a block is much cheaper than slicing every line
+            for blockStartIndex in range(startIndex, endIndex, archiveLinesPerBlock):
+                blockEndIndex = min(blockStartIndex + archiveLinesPerBlock, endIndex)
+                blockEnd = self.lineOffsets[blockEndIndex] if blockEndIndex < len(self.lineOffsets) else len(self.logMap)
+                blockText = self.logMap[self.lineOffsets[blockStartIndex]:blockEnd].decode('utf-8', errors='replace')
+                lines = blockText.split('\n')
+                for line in islice(lines, blockEndIndex - blockStartIndex):
+                    yield line.rstrip('\r')
+            return
+        with gzip.open(self.logPath, 'rb') as logFile:
+            # Seeking in gzip decompresses up to the offset but keeps nothing in memory
+            logFile.seek(self.lineOffsets[startIndex])
+            for line in islice(logFile, endIndex - startIndex):
+                yield line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def getLines(self, startLine, lineCount):
+        return list(self.iterLines(startLine, lineCount))
+
+    def search(self, pattern):
+        """Search lines matching a regular expression
+
+        Parameters
+        ----------
+        pattern : str
+            Regular expression
+
+        Returns
+        -------
+        generator
+            (line number, line) of every matching line
+        """
+        # Matched line by line like streamed logs so results do not depend on compression
+        compiledPattern = re.compile(pattern)
+        for lineNumber, line in enumerate(self.iterLines(), 1):
+            if compiledPattern.search(line):
+                yield lineNumber, line
+
+def getArchivePaths(config, buildPath):
+    archiveDirectory = getArchiveDirectory(config)
+    archiveName = urllib.parse.quote(buildPath.strip('/'), safe='')
+    logExtension = '.log.gz' if getArchiveSettings(config)['compress'] else '.log'
+    return os.path.join(archiveDirectory, archiveName + logExtension), os.path.join(archiveDirectory, archiveName + '.idx')
+
+def openArchivedLog(config, buildPath):
+    logPath, indexPath = getArchivePaths(config, buildPath)
+    # Index is written last, a log without index was not archived completely
+    if not os.path.exists(indexPath):
+        return None
+    if not os.path.exists(logPath):
+        # Logs archived before compress was changed keep their extension
+        logPath = logPath[:-len('.gz')] if logPath.endswith('.gz') else logPath + '.gz'
+        if not os.path.exists(logPath):
+            return None
+    # Modification time orders logs for eviction
+    os.utime(indexPath)
+    return ArchivedLog(logPath, indexPath)
+
+class ConsoleArchiveWriter:
+    """Write a streamed console log into the archive while it is being read
+
+    Log and line index go to temporary files, commit renames them once the
+    whole log was read and discard removes them when the stream stopped
+    early, so the archive never holds a partial log
+    """
+
+    def __init__(self, config, buildPath):
+        self.config = config
+        self.logPath, self.indexPath = getArchivePaths(config, buildPath)
+        self.lineOffsets = array('Q')
+        self.offset = 0
+        self.tempLogFile = None
+        self.tempLogPath = None
+        self.logWriter = None
+        self.done = False
+
+    def openTempLog(self):
+        archiveDirectory = os.path.dirname(self.logPath)
+        os.makedirs(archiveDirectory, exist_ok=True)
+        tempLogDescriptor, self.tempLogPath = tempfile.mkstemp(dir=archiveDirectory, suffix='.tmp')
+        self.tempLogFile = os.fdopen(tempLogDescriptor, 'wb')
+        self.logWriter = gzip.GzipFile(fileobj=self.tempLogFile, mode='wb') if self.logPath.endswith('.gz') else self.tempLogFile
+
+    def write(self, chunk):
+        if self.done:
+            return
+        try:
+            if self.tempLogFile is None:
+                self.openTempLog()
+            if self.offset == 0 and chunk:
+                self.lineOffsets.append(0)
+            newLinePosition = chunk.find(b'\n')
+            while newLinePosition != -1:
+                self.lineOffsets.append(self.offset + newLinePosition + 1)
+                newLinePosition = chunk.find(b'\n', newLinePosition + 1)
+            self.logWriter.write(chunk)
+            self.offset += len(chunk)
+        except OSError as e:
+            # Reading the log goes on without archiving it
+            print(colored("Could not archive console text: {}".format(e), 'yellow'))
+            self.discard()
+
+    def commit(self):
+        if self.done:
+            return
+        tempIndexPath = None
+        try:
+            if self.tempLogFile is None:
+                self.openTempLog()
+            if self.lineOffsets and self.lineOffsets[-1] == self.offset:
+                # Log ends with a line break, there is no line after it
+                self.lineOffsets.pop()
+            if self.logWriter is not self.tempLogFile:
+                self.logWriter.close()
+            self.tempLogFile.flush()
+            os.fsync(self.tempLogFile.fileno())
+            self.tempLogFile.close()
+            tempIndexDescriptor, tempIndexPath = tempfile.mkstemp(dir=os.path.dirname(self.indexPath), suffix='.tmp')
+            with os.fdopen(tempIndexDescriptor, 'wb') as tempIndexFile:
+                self.lineOffsets.tofile(tempIndexFile)
+                tempIndexFile.flush()
+                os.fsync(tempIndexFile.fileno())
+            # Index is renamed last, a log without index was not archived completely
+            os.replace(self.tempLogPath, self.logPath)
+            os.replace(tempIndexPath, self.indexPath)
+            self.done = True
+            # Copy archived before compress was changed is replaced by this one
+            otherLogPath = self.logPath[:-len('.gz')] if self.logPath.endswith('.gz') else self.logPath + '.gz'
+            if os.path.exists(otherLogPath):
+                os.remove(otherLogPath)
+        except OSError as e:
+            print(colored("Could not archive console text: {}".format(e), 'yellow'))
+            if tempIndexPath is not None and os.path.exists(tempIndexPath):
+                os.remove(tempIndexPath)
+            self.discard()
+            return
+        evictLogArchive(self.config)
+
+    def discard(self):
+        if self.done:
+            return
+        self.done = True
+        if self.tempLogFile is not None:
+            self.tempLogFile.close()
+            if os.path.exists(self.tempLogPath):
+                os.remove(self.tempLogPath)
+        self.lineOffsets = array('Q')
+
+def evictLogArchive(config):
+    """Remove least recently used logs until archive is within maxBytes"""
+    maxBytes = getArchiveSettings(config)['maxBytes']
+    archiveDirectory = getArchiveDirectory(config)
+    with archiveLock:
+        archivedLogs = []
+        totalSize = 0
+        for entry in os.scandir(archiveDirectory):
+            if not entry.name.endswith('.idx'):
+                continue
+            archiveName = entry.name[:-len('.idx')]
+            archivePaths = [entry.path] + [os.path.join(archiveDirectory, archiveName + logExtension) for logExtension in ('.log', '.log.gz')]
+            archiveSize = sum(os.path.getsize(archivePath) for archivePath in archivePaths if os.path.exists(archivePath))
+            archivedLogs.append((entry.stat().st_mtime, archiveSize, archivePaths))
+            totalSize += archiveSize
+        for lastUsed, archiveSize, archivePaths in sorted(archivedLogs):
+            if totalSize <= maxBytes:
+                break
+            for archivePath in archivePaths:
+                if os.path.exists(archivePath):
+                    os.remove(archivePath)
+            totalSize -= archiveSize
+
+def getArchivedLog(config, buildPath, jobNumber):
+    """Get console log of a build from the archive
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    buildPath : str
+        Path of the build ending with /, job number can be symbolic (lastBuild)
+    jobNumber : str
+        Job number
+
+    Returns
+    -------
+    tuple
+        (ArchivedLog, None) for archived logs, (None, ConsoleArchiveWriter)
+        for completed builds not archived yet and (None, None) when archive
+        is disabled or build is still running
+    """
+    if not getArchiveSettings(config)['enabled']:
+        return None, None
+    if str(jobNumber).isdigit():
+        archivedLog = openArchivedLog(config, buildPath)
+        if archivedLog is not None:
+            recordCacheLookup('logArchive', True)
+            return archivedLog, None
+    build = makeRequest(buildApiUrl(buildPath + "api/json", "buildStatus"), "get", config)
+    if not isinstance(build, dict) or build['building']:
+        return None, None
+    # Symbolic job numbers are archived under the build number they point to
+    buildPath = buildPath.rstrip('/').rsplit('/', 1)[0] + "/" + str(build['number']) + "/"
+    archivedLog = openArchivedLog(config, buildPath)
+    recordCacheLookup('logArchive', archivedLog is not None)
+    if archivedLog is not None:
+        return archivedLog, None
+    return None, ConsoleArchiveWriter(config, buildPath)
+
+def getJobPath(pipeLineName, branchName, jobNumber):
+    # Promotion pipelines are not multibranch, their builds have no branch level
+    if not branchName:
+        return "job/"+pipeLineName+"/"+str(jobNumber)+"/"
+    return "job/"+pipeLineName+"/job/"+branchName+"/"+str(jobNumber)+"/"
+
+def streamConsoleText(config, pipeLineName, branchName, jobNumber, startLine=1, lineCount=None):
+    return streamBuildConsoleText(config, getJobPath(pipeLineName, branchName, jobNumber), jobNumber, startLine, lineCount)
+
+def searchConsoleText(config, pipeLineName, branchName, jobNumber, pattern):
+    """Search console text lines matching a regular expression
+
+    Returns
+    -------
+    generator
+        (line number, line) of every matching line
+    """
+    buildPath = getJobPath(pipeLineName, branchName, jobNumber)
+    archivedLog, archiveWriter = openConsoleArchive(config, buildPath, jobNumber)
+    if archivedLog is not None:
+        with archivedLog:
+            yield from archivedLog.search(pattern)
+        return
+    compiledPattern = re.compile(pattern)
+    for lineNumber, line in enumerate(streamResponseConsoleText(config, buildPath, jobNumber, archiveWriter), 1):
+        if compiledPattern.search(line):
+            yield lineNumber, line
+
+def streamBuildConsoleText(config, buildPath, jobNumber, startLine=1, lineCount=None, completeArchive=True):
+    """Iterate over console text lines of a build
+
+    Completed builds are read from the local log archive, the first read of a
+    completed build archives it while its lines are streamed from jenkins.
+    When the caller stops early the rest of the log is still read into the
+    archive unless completeArchive is False
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    buildPath : str
+        Path of the build ending with /
+    jobNumber : str
+        Job number
+    startLine : int
+        First line (1 based)
+    lineCount : int
+        Number of lines, None for all lines until the end
+    completeArchive : bool
+        Read the rest of a completed build's log into the archive when the
+        caller stops early (Ex. --lines), interactive readers pass False so
+        closing them does not wait for the download
+
+    Returns
+    -------
+    generator
+        lines without line endings
+    """
+    archivedLog, archiveWriter = openConsoleArchive(config, buildPath, jobNumber)
+    if archivedLog is not None:
+        with archivedLog:
+            yield from archivedLog.iterLines(startLine, lineCount)
+        return
+    consoleLines = streamResponseConsoleText(config, buildPath, jobNumber, archiveWriter)
+    readRest = archiveWriter is not None and completeArchive
+    try:
+        yield from islice(consoleLines, startLine - 1, None if lineCount is None else startLine - 1 + lineCount)
+    except GeneratorExit:
+        if readRest:
+            deque(consoleLines, maxlen=0)
+        raise
+    else:
+        if readRest:
+            deque(consoleLines, maxlen=0)
+    finally:
+        consoleLines.close()
+
+def openConsoleArchive(config, buildPath, jobNumber):
+    # Falls back to streaming without archiving when the build status is not available
+    import requests
+    try:
+        return getArchivedLog(config, buildPath, jobNumber)
+    except requests.exceptions.RequestException:
+        return None, None
+
+def streamResponseConsoleText(config, buildPath, jobNumber, archiveWriter=None):
+    jobConsoleTextUrl = buildPath + "consoleText"
+    import requests
+    response = makeStreamRequest(jobConsoleTextUrl, "post", config)
+    if response is None:
+        return
+    if response.status_code != 200:
+        print(colored("Could not get console text for job {} ({})".format(jobNumber, response.status_code), 'red'))
+        response.close()
+        return
+    try:
+        yield from iterResponseLines(response, getConsoleSettings(config)['streamChunkSize'], archiveWriter)
+    except requests.exceptions.RequestException:
+        print("{}".format(colored("An error occurred while reading console text", 'red')))
+
+def tailConsoleText(config, pipeLineName, branchName, jobNumber):
+    tailBuildConsoleText(config, getJobPath(pipeLineName, branchName, jobNumber), jobNumber)
+
+def tailBuildConsoleText(config, buildPath, jobNumber):
+    """Follow console text of a running job
+
+    Uses jenkins progressiveText offsets so every poll only downloads bytes
+    written since the previous one. Polling backs off while the log is idle
+    and stops once jenkins reports no more data
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    buildPath : str
+        Path of the build ending with /, Ex. job/<pipeline>/job/<branch>/42/
+    jobNumber : str
+        Job number
+
+    Returns
+    -------
+    bool
+        True when the build finished while tailing
+    """
+    import requests
+    consoleSettings = getConsoleSettings(config)
+    minInterval = consoleSettings['tailMinInterval']
+    maxInterval = consoleSettings['tailMaxInterval']
+    progressiveTextUrl = buildPath + "logText/progressiveText?start={}"
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    offset = 0
+    interval = minInterval
+    try:
+        while True:
+            response = makeStreamRequest(progressiveTextUrl.format(offset), "get", config)
+            if response is None:
+                return False
+            if response.status_code != 200:
+                print(colored("Could not tail console text for job {} ({})".format(jobNumber, response.status_code), 'red'))
+                response.close()
+                return False
+            moreData = response.headers.get('X-More-Data') == 'true'
+            nextOffset = int(response.headers.get('X-Text-Size', offset))
+            try:
+                for chunk in response.iter_content(chunk_size=consoleSettings['streamChunkSize']):
+                    recordResponseBytes(response.endpointName, len(chunk))
+                    sys.stdout.write(decoder.decode(chunk))
+            finally:
+                response.close()
+            sys.stdout.flush()
+
+            if not moreData:
+                sys.stdout.write(decoder.decode(b'', final=True))
+                print(colored("\nJob {} finished".format(jobNumber), 'green'))
+                return True
+            # Poll quickly while output is flowing, back off while idle
+            if nextOffset > offset:
+                interval = minInterval
+            else:
+                interval = min(interval * 2, maxInterval)
+            offset = nextOffset
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print(colored("\nStopped tailing job {}".format(jobNumber), 'yellow'))
+    except requests.exceptions.RequestException:
+        print("{}".format(colored("An error occurred while tailing console text", 'red')))
+    return False
+
+def processUserDetails(name, email):
+    print("Logged in as")
+    print("Name: {}".format(colored(name, 'green', attrs=['bold'])))
+    print("Email: {}".format(colored(email, 'green', attrs=['bold'])))
+
+def getUserAuthToken(config):
+    tokenResponse = makeAuthRequest('crumbIssuer/api/json', 'get', config)
+    return tokenResponse['crumb']
+
+def printUserDetails(config):
+    userDetails = makeRequest(buildApiUrl("me/api/json", "userDetails"), "post", config)
+    # Only the mailer property has an address, others are empty with tree filter
+    email = ''
+    for userProperty in userDetails['property']:
+        if userProperty.get('address'):
+            email = userProperty['address']
+            break
+    fullName = userDetails['fullName']
+    saveUserInfo(config, fullName, email)
+    processUserDetails(fullName, email)
+
+def getRepositoryNames(pipeLineList):
+    repoListNames = []
+    for pipeLineItem in pipeLineList:
+        repo = pipeLineItem['repo']
+        repoListNames.append(repo)
+    return repoListNames
+
+def getPipeLineInfo(pipeLineList, index, propertyName):
+    return pipeLineList[index][propertyName]
+
+def getPipeLineJobs(pipeLineName, config):
+    # Raises instead of printing, callers report the error (branches may be refreshed behind a menu)
+    pipeLineJobsUrl = buildApiUrl("job/"+pipeLineName+"/api/json", "pipeLineJobs")
+    pipeLineJobsResponse = processResponse(sendRequest(pipeLineJobsUrl, "post", config))
+    if not isinstance(pipeLineJobsResponse, dict):
+        raise ValueError("Unexpected status code {}".format(pipeLineJobsResponse.status_code))
+    pipeLineJobs = pipeLineJobsResponse['jobs']
+    pipeLineJobNames = {}
+    for pipeLineJob in pipeLineJobs:
+        # print(pipeLineJob, type(pipeLineJob))
+        pipeLineJobName = pipeLineJob['name']
+        urlSafeName = urllib.parse.unquote(pipeLineJobName)
+        pipeLineJobNames[pipeLineJobName] = urlSafeName
+    return pipeLineJobNames
+
+def getRunSettings(config):
+    runSettings = dict(defaultRunSettings)
+    runSettings.update(config.get('runSettings', {}))
+    return runSettings
+
+def processRuns(config, runItems, pipeLineName, branchName, maxWorkers):
+    """Process runs fetching change sets of every run
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    runItems : list
+        Run items (key, value pairs) from wfapi/runs
+    pipeLineName : str
+        Pipeline name
+    branchName : str
+        Url safe branch name
+    maxWorkers : int
+        Maximum number of change sets fetched in parallel, 1 fetches serially
+
+    Returns
+    -------
+    list
+        processed runs in the same order as runItems
+    """
+    if maxWorkers <= 1 or len(runItems) <= 1:
+        return [processRun(config, runItem, pipeLineName, branchName) for runItem in runItems]
+    workers = min(maxWorkers, len(runItems))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map keeps results in submission order
+        return list(executor.map(lambda runItem: processRun(config, runItem, pipeLineName, branchName), runItems))
+
+def fetchJobRuns(config, pipeLineName, branchName, runsToConsider=None):
+    jobRunsUrl = "job/"+pipeLineName+"/job/"+branchName+"/wfapi/runs"
+    jobRunsResponse = makeRequest(jobRunsUrl, "post", config)
+    # print(jobRunsResponse)
+    runSettings = getRunSettings(config)
+    if runsToConsider is None:
+        runsToConsider = runSettings['runsToConsider']
+    runItems = []
+    for i in islice(jobRunsResponse, 0, runsToConsider):
+        runItems.append(i.items())
+    runsInfo = processRuns(config, runItems, pipeLineName, branchName, runSettings['changeSetWorkers'])
+    evictRunCache(config)
+    return runsInfo
+
+def getJobRuns(config, pipeLineName, branchName):
+    # Prefetched by the daemon when it is running
+    runsInfo = fetchDaemonRuns(config, pipeLineName, branchName)
+    if runsInfo is None:
+        runsInfo = fetchJobRuns(config, pipeLineName, branchName)
+    
+    # Render all runs into one buffer written at once
+    writeOutput(''.join(renderRun(runItem) for runItem in runsInfo))
+
+def getHistorySettings(config):
+    historySettings = dict(defaultHistorySettings)
+    historySettings.update(config.get('historySettings', {}))
+    return historySettings
+
+def processStageRun(runItem):
+    # Only numbers are kept, durations of stages which did not succeed are not comparable
+    return {
+        'status': runItem['status'],
+        'startTime': runItem.get('startTimeMillis', 0),
+        'stages': [[stage['name'], stage['durationMillis'] if stage['status'] == 'SUCCESS' else -1] for stage in runItem.get('stages', [])]
+    }
+
+def getCachedStageRuns(config, pipeLineName, branchName):
+    with runCacheLock:
+        cache = getRunCache(config)
+        if cache is None:
+            return {}
+        rows = cache.execute("SELECT runId, data FROM stageRuns WHERE pipeLineName = ? AND branchName = ?", (pipeLineName, branchName)).fetchall()
+        if rows:
+            cache.execute("UPDATE stageRuns SET lastAccess = ? WHERE pipeLineName = ? AND branchName = ?", (time.time(), pipeLineName, branchName))
+            cache.commit()
+    return {runId: json.loads(data) for runId, data in rows}
+
+def saveCachedStageRuns(config, pipeLineName, branchName, stageRuns):
+    rows = []
+    for runId, stageRun in stageRuns.items():
+        if stageRun['status'] in historyRunStatuses:
+            data = json.dumps(stageRun, separators=(',', ':'))
+            rows.append((pipeLineName, branchName, runId, data, len(data), time.time()))
+    if not rows:
+        return
+    with runCacheLock:
+        cache = getRunCache(config)
+        if cache is None:
+            return
+        cache.executemany("INSERT OR REPLACE INTO stageRuns VALUES (?, ?, ?, ?, ?, ?)", rows)
+        cache.commit()
+    evictRunCache(config)
+
+def listBranchRunNumbers(config, branchPath, runCount, pageSize):
+    """List newest run numbers of a branch paging through its builds
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    branchPath : str
+        Path of the branch job ending with /
+    runCount : int
+        Number of run numbers wanted
+    pageSize : int
+        Run numbers fetched per request
+
+    Returns
+    -------
+    list
+        run numbers, newest first
+    """
+    runNumbers = []
+    while len(runNumbers) < runCount:
+        start = len(runNumbers)
+        end = min(start + pageSize, runCount)
+        pageUrl = buildApiUrl(branchPath + "api/json", "branchBuilds") + urllib.parse.quote("{{{},{}}}".format(start, end), safe=',')
+        pageResponse = makeRequest(pageUrl, "get", config)
+        if not isinstance(pageResponse, dict):
+            raise ValueError("Could not list runs of {}".format(branchPath))
+        builds = pageResponse.get('builds') or []
+        runNumbers.extend(build['number'] for build in builds)
+        if len(builds) < end - start:
+            break
+    return runNumbers
+
+def fetchStageRun(config, branchPath, runNumber):
+    runItem = makeRequest(branchPath + str(runNumber) + "/wfapi/describe", "get", config)
+    if not isinstance(runItem, dict):
+        return None
+    return processStageRun(runItem)
+
+def fetchStageHistory(config, pipeLineName, branchName, runCount=None):
+    """Fetch stage durations of the newest runs of a branch
+
+    Newest runs come with their stages from a single wfapi/runs call, older
+    runs are paged from the branch builds and described one by one. Finished
+    runs are kept in the run cache so only new runs are downloaded next time
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    pipeLineName : str
+        Pipeline name
+    branchName : str
+        Url safe branch name
+    runCount : int
+        Number of runs, defaults to historySettings.runs
+
+    Returns
+    -------
+    dict
+        stage history in columnar form, see buildStageColumns
+    """
+    historySettings = getHistorySettings(config)
+    if runCount is None:
+        runCount = historySettings['runs']
+    branchPath = "job/"+pipeLineName+"/job/"+branchName+"/"
+    stageRuns = getCachedStageRuns(config, pipeLineName, branchName)
+    newStageRuns = {}
+    latestRuns = makeRequest(branchPath + "wfapi/runs", "get", config)
+    if not isinstance(latestRuns, list):
+        raise ValueError("Could not get runs of {}".format(branchPath))
+    for runItem in latestRuns:
+        newStageRuns[int(runItem['id'])] = processStageRun(runItem)
+    runNumbers = sorted(newStageRuns, reverse=True)[:runCount]
+    # wfapi/runs is capped by jenkins, older runs need paging
+    if len(latestRuns) < runCount and runNumbers and min(runNumbers) > 1:
+        runNumbers = listBranchRunNumbers(config, branchPath, runCount, historySettings['pageSize'])
+    missingRunNumbers = [runNumber for runNumber in runNumbers if runNumber not in newStageRuns and runNumber not in stageRuns]
+    if missingRunNumbers:
+        with ThreadPoolExecutor(max_workers=max(1, min(historySettings['workers'], len(missingRunNumbers)))) as executor:
+            for runNumber, stageRun in zip(missingRunNumbers, executor.map(lambda runNumber: fetchStageRun(config, branchPath, runNumber), missingRunNumbers)):
+                if stageRun is not None:
+                    newStageRuns[runNumber] = stageRun
+    saveCachedStageRuns(config, pipeLineName, branchName, {runNumber: stageRun for runNumber, stageRun in newStageRuns.items() if runNumber not in stageRuns})
+    stageRuns.update(newStageRuns)
+    return buildStageColumns([(runNumber, stageRuns[runNumber]) for runNumber in sorted(runNumbers) if runNumber in stageRuns])
+
+def buildStageColumns(stageRuns):
+    """Convert runs to one duration column per stage
+
+    Parameters
+    ----------
+    stageRuns : list
+        (run number, stage run) pairs, oldest first
+
+    Returns
+    -------
+    dict
+        runIds and startTimes arrays, statuses list, stageNames in first seen
+        order and durations mapping stage name to an array aligned with runIds
+        holding milliseconds or -1 when the stage did not succeed in that run
+    """
+    stageHistory = {'runIds': array('l'), 'startTimes': array('q'), 'statuses': [], 'stageNames': [], 'durations': {}}
+    for runIndex, (runNumber, stageRun) in enumerate(stageRuns):
+        if stageRun['status'] not in historyRunStatuses:
+            continue
+        stageHistory['runIds'].append(runNumber)
+        stageHistory['startTimes'].append(stageRun['startTime'])
+        stageHistory['statuses'].append(stageRun['status'])
+        runCount = len(stageHistory['runIds'])
+        for stageName, durationMillis in stageRun['stages']:
+            if stageName not in stageHistory['durations']:
+                stageHistory['stageNames'].append(stageName)
+                stageHistory['durations'][stageName] = array('l', [-1] * (runCount - 1))
+            column = stageHistory['durations'][stageName]
+            # A stage running twice in one run (retries) counts once with its total
+            if len(column) == runCount:
+                column[-1] = column[-1] + durationMillis if column[-1] >= 0 and durationMillis >= 0 else -1
+            else:
+                column.append(durationMillis)
+        for column in stageHistory['durations'].values():
+            if len(column) < runCount:
+                column.append(-1)
+    return stageHistory
+
+def getPercentile(sortedValues, percentile):
+    # Nearest rank
+    rank = max(1, int(-(-percentile * len(sortedValues) // 100)))
+    return sortedValues[rank - 1]
+
+def getTrendSlope(points):
+    # Least squares slope of (run index, duration) points
+    count = len(points)
+    meanX = sum(point[0] for point in points) / count
+    meanY = sum(point[1] for point in points) / count
+    varianceX = sum((point[0] - meanX) ** 2 for point in points)
+    if varianceX == 0:
+        return 0.0
+    return sum((point[0] - meanX) * (point[1] - meanY) for point in points) / varianceX
+
+def analyzeStageHistory(config, stageHistory):
+    """Compute p50, p95, trend and regressions of every stage
+
+    A stage is flagged as a regression when the median of its recentRuns
+    latest durations is more than regressionThreshold and regressionMinSeconds
+    above the median of the runs before them
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    stageHistory : dict
+        stage history from fetchStageHistory
+
+    Returns
+    -------
+    list
+        stage statistics in pipeline order, durations in milliseconds and
+        trend in milliseconds per run
+    """
+    historySettings = getHistorySettings(config)
+    recentRuns = historySettings['recentRuns']
+    stageStats = []
+    for stageName in stageHistory['stageNames']:
+        points = [(runIndex, durationMillis) for runIndex, durationMillis in enumerate(stageHistory['durations'][stageName]) if durationMillis >= 0]
+        if not points:
+            continue
+        sortedDurations = sorted(point[1] for point in points)
+        stageStat = {
+            'stage': stageName,
+            'runs': len(points),
+            'p50': getPercentile(sortedDurations, 50),
+            'p95': getPercentile(sortedDurations, 95),
+            'trend': round(getTrendSlope(points), 1),
+            'recentP50': None,
+            'baselineP50': None,
+            'regression': False
+        }
+        if len(points) > recentRuns:
+            recentP50 = getPercentile(sorted(point[1] for point in points[-recentRuns:]), 50)
+            baselineP50 = getPercentile(sorted(point[1] for point in points[:-recentRuns]), 50)
+            stageStat['recentP50'] = recentP50
+            stageStat['baselineP50'] = baselineP50
+            stageStat['regression'] = recentP50 > baselineP50 * (1 + historySettings['regressionThreshold']) and recentP50 - baselineP50 >= historySettings['regressionMinSeconds'] * 1000
+        stageStats.append(stageStat)
+    return stageStats
+
+def formatDuration(milliseconds):
+    if milliseconds is None:
+        return '-'
+    minutes, seconds = mil_convert(int(milliseconds))
+    return "{}m {}s".format(minutes, seconds)
+
+def printStageStats(stageHistory, stageStats):
+    runIds = stageHistory['runIds']
+    if not runIds:
+        print(colored("No finished runs found", 'yellow'))
+        return
+    print("Stage durations of {} runs (#{} - #{})".format(len(runIds), runIds[0], runIds[-1]))
+    statsFormat = "{:<40} {:>5} {:>9} {:>9} {:>11} {:>9} {:>9}"
+    print("{d[0]:<53} {d[1]:>18} {d[2]:>22} {d[3]:>22} {d[4]:>24} {d[5]:>22} {d[6]:>22}".format(d=[getHeaderText(header) for header in ['Stage', 'Runs', 'p50', 'p95', 'Trend/run', 'Before', 'Recent']]))
+    for stageStat in stageStats:
+        trend = "{:+.1f}s".format(stageStat['trend'] / 1000)
+        line = statsFormat.format(stageStat['stage'][:40], stageStat['runs'], formatDuration(stageStat['p50']), formatDuration(stageStat['p95']), trend, formatDuration(stageStat['baselineP50']), formatDuration(stageStat['recentP50']))
+        if stageStat['regression']:
+            line = colored(line + "  REGRESSION", 'red')
+        print(line)
+
+def getStageHistory(config, pipeLineName, branchName, runCount=None):
+    try:
+        stageHistory = fetchStageHistory(config, pipeLineName, branchName, runCount)
+    except ValueError as e:
+        print(colored(str(e), 'red'))
+        return
+    printStageStats(stageHistory, analyzeStageHistory(config, stageHistory))
+
+def compileErrorPatterns(errorPatterns):
+    """Compile error patterns from config
+
+    Every pattern needs a category and a contains substring, a regex pattern
+    or both. The substring is checked first with a plain `in` and the regex
+    only runs on lines which passed it, without contains every line is
+    matched against the regex
+
+    Parameters
+    ----------
+    errorPatterns : list
+        Error pattern items with category, optional contains and optional pattern
+
+    Returns
+    -------
+    list
+        (category, contains, compiled regex or None) tuples in config order
+
+    Raises
+    ------
+    ValueError
+        when an entry has no category, neither contains nor pattern or an invalid regex
+    """
+    compiledPatterns = []
+    for index, errorPattern in enumerate(errorPatterns):
+        entryName = "errorPatterns entry {} in jenkins.json".format(index + 1)
+        if not isinstance(errorPattern, dict) or not errorPattern.get('category'):
+            raise ValueError("Invalid {}: category is required".format(entryName))
+        contains = errorPattern.get('contains', '')
+        pattern = errorPattern.get('pattern')
+        if not contains and not pattern:
+            raise ValueError("Invalid {} ({}): contains or pattern is required".format(entryName, errorPattern['category']))
+        try:
+            compiledPattern = re.compile(pattern) if pattern else None
+        except re.error as e:
+            raise ValueError("Invalid {} ({}): {}".format(entryName, errorPattern['category'], e))
+        compiledPatterns.append((errorPattern['category'], contains, compiledPattern))
+    return compiledPatterns
+
+def getErrorPatterns(config):
+    global compiledErrorPatterns
+    if compiledErrorPatterns is None:
+        compiledErrorPatterns = compileErrorPatterns(config.get('errorPatterns', defaultErrorPatterns))
+    return compiledErrorPatterns
+
+def classifyErrorLines(lines, errorPatterns):
+    """Classify console lines by error category
+
+    Parameters
+    ----------
+    lines : iterable
+        Console text lines
+    errorPatterns : list
+        Compiled error patterns from compileErrorPatterns
+
+    Returns
+    -------
+    generator
+        (line number, category, line) for every line matching a category,
+        a line is reported only under the first category it matches
+    """
+    for lineNumber, line in enumerate(lines, 1):
+        for category, contains, compiledPattern in errorPatterns:
+            if contains not in line:
+                continue
+            if compiledPattern is not None and not compiledPattern.search(line):
+                continue
+            yield lineNumber, category, line
+            break
+
+def printJobErrors(errors):
+    errorSummary = OrderedDict()
+    for lineNumber, category, line in errors:
+        print("{} {}".format(colored("{:>8}:".format(lineNumber), 'yellow'), colored(line, 'red')))
+        errorSummary.setdefault(category, []).append(lineNumber)
+    printErrorSummary(errorSummary)
+
+def printErrorSummary(errorSummary):
+    lineNumbersToShow = 10
+    print("{:-^70}".format(''))
+    if not errorSummary:
+        print(colored("No errors found", 'green'))
+        return
+    print("{d[0]:<38} {d[1]:>18}   {d[2]}".format(d=[getHeaderText('Category'), getHeaderText('Count'), getHeaderText('Lines')]))
+    for category, lineNumbers in errorSummary.items():
+        lineNumbersText = ', '.join(str(lineNumber) for lineNumber in lineNumbers[:lineNumbersToShow])
+        if len(lineNumbers) > lineNumbersToShow:
+            lineNumbersText += ', ...'
+        print("{:<25} {:>5}   {}".format(category, len(lineNumbers), lineNumbersText))
+
+def getJobErrors(config, pipeLineName, branchName, jobNumber):
+    try:
+        errorPatterns = getErrorPatterns(config)
+    except ValueError as e:
+        print(colored(str(e), 'red'))
+        return
+    consoleLines = streamConsoleText(config, pipeLineName, branchName, jobNumber)
+    printJobErrors(classifyErrorLines(consoleLines, errorPatterns))
+
+def getJobConsoleText(config, pipeLineName, branchName, jobNumber):
+    buildPath = getJobPath(pipeLineName, branchName, jobNumber)
+    title = "Job {} console".format(jobNumber)
+    archivedLog, archiveWriter = openConsoleArchive(config, buildPath, jobNumber)
+    if archivedLog is not None:
+        with archivedLog:
+            showLines(config, archivedLog, title)
+        return
+    # Lines scrolled back to are read again, from the archive once the stream completed it
+    reopenConsole = lambda startLine: streamBuildConsoleText(config, buildPath, jobNumber, startLine, completeArchive=False)
+    consoleLines = LazyLines(streamResponseConsoleText(config, buildPath, jobNumber, archiveWriter), reopenConsole, getRenderSettings(config)['pagerWindowLines'])
+    showLines(config, consoleLines, title)
+
+def getJobConsoleMatches(config, pipeLineName, branchName, jobNumber, pattern):
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        print(colored("Invalid regular expression: {}".format(e), 'red'))
+        return
+    matchCount = 0
+    for lineNumber, line in searchConsoleText(config, pipeLineName, branchName, jobNumber, pattern):
+        print("{} {}".format(colored("{:>8}:".format(lineNumber), 'yellow'), line))
+        matchCount += 1
+    print("{:-^70}".format(''))
+    print("{} matching lines".format(matchCount))
+
+def getDiffSettings(config):
+    diffSettings = dict(defaultDiffSettings)
+    diffSettings.update(config.get('diffSettings', {}))
+    return diffSettings
+
+def getDiffNormalizePatterns(config):
+    global compiledDiffNormalizePatterns
+    if compiledDiffNormalizePatterns is None:
+        normalizePatterns = config.get('diffNormalizePatterns', defaultDiffNormalizePatterns)
+        compiledDiffNormalizePatterns = [(re.compile(normalizePattern['pattern']), normalizePattern['replacement']) for normalizePattern in normalizePatterns]
+    return compiledDiffNormalizePatterns
+
+def normalizeLine(line, normalizePatterns):
+    for compiledPattern, replacement in normalizePatterns:
+        line = compiledPattern.sub(replacement, line)
+    return line.strip()
+
+class LineHashFilter:
+    """Bloom filter of line hashes
+
+    Memory stays at filterBytes however long the log is, a line which was
+    never added is reported as present only with a small false positive
+    probability
+    """
+
+    def __init__(self, filterBytes, hashFunctions):
+        self.bits = bytearray(filterBytes)
+        self.bitCount = filterBytes * 8
+        self.hashFunctions = hashFunctions
+
+    def getBitIndexes(self, line):
+        # Double hashing, two halves of one 64 bit hash give every bit index
+        lineHash = hash(line) & 0xFFFFFFFFFFFFFFFF
+        firstHash = lineHash & 0xFFFFFFFF
+        secondHash = (lineHash >> 32) | 1
+        return [(firstHash + index * secondHash) % self.bitCount for index in range(self.hashFunctions)]
+
+    def add(self, line):
+        bits = self.bits
+        for bitIndex in self.getBitIndexes(line):
+            bits[bitIndex >> 3] |= 1 << (bitIndex & 7)
+
+    def __contains__(self, line):
+        bits = self.bits
+        for bitIndex in self.getBitIndexes(line):
+            if not bits[bitIndex >> 3] & (1 << (bitIndex & 7)):
+                return False
+        return True
+
+def getBuildNumber(config, buildPath):
+    # Resolves symbolic job numbers like lastFailedBuild, None when there is no such build
+    build = makeRequest(buildApiUrl(buildPath + "api/json", "buildStatus"), "get", config)
+    if not isinstance(build, dict):
+        return None
+    return build['number']
+
+def findLastGreenRun(config, pipeLineName, branchName, beforeNumber):
+    """Find newest successful run older than beforeNumber
+
+    Runs from wfapi/runs are checked first, then lastSuccessfulBuild and for
+    older failing runs the branch builds are paged until a successful one
+
+    Returns
+    -------
+    int
+        run number or None when there is no successful run
+    """
+    branchPath = "job/"+pipeLineName+"/job/"+branchName+"/"
+    latestRuns = makeRequest(branchPath + "wfapi/runs", "get", config)
+    if isinstance(latestRuns, list):
+        for runItem in latestRuns:
+            if runItem['status'] == 'SUCCESS' and int(runItem['id']) < beforeNumber:
+                return int(runItem['id'])
+    lastSuccessfulNumber = getBuildNumber(config, branchPath + "lastSuccessfulBuild/")
+    if lastSuccessfulNumber is None or lastSuccessfulNumber < beforeNumber:
+        return lastSuccessfulNumber
+    pageSize = getHistorySettings(config)['pageSize']
+    start = 0
+    while True:
+        pageUrl = buildApiUrl(branchPath + "api/json", "branchBuildResults") + urllib.parse.quote("{{{},{}}}".format(start, start + pageSize), safe=',')
+        pageResponse = makeRequest(pageUrl, "get", config)
+        builds = pageResponse.get('builds') or [] if isinstance(pageResponse, dict) else []
+        for build in builds:
+            if build['result'] == 'SUCCESS' and build['number'] < beforeNumber:
+                return build['number']
+        if len(builds) < pageSize:
+            return None
+        start += pageSize
+
+def getDiffLineKey(line):
+    leadingTime = diffLeadingTimePattern.match(line)
+    return line[leadingTime.end():] if leadingTime else line
+
+def diffConsoleText(config, greenPath, greenNumber, failingPath, failingNumber, diffStats):
+    """Find console lines of a failing build which are not in a green build
+
+    Both logs are streamed. Normalized lines of the green log are added to a
+    LineHashFilter, then lines of the failing log whose normalized form is
+    not in the filter are reported, a repeated line only once. Normalizing
+    is the expensive part, lines seen recently (ignoring a leading
+    timestamp) are skipped through a cache of lineCacheSize lines
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    greenPath : str
+        Path of the green build ending with /
+    greenNumber : int
+        Green build number
+    failingPath : str
+        Path of the failing build ending with /
+    failingNumber : int
+        Failing build number
+    diffStats : dict
+        Filled with greenLines, failingLines and uniqueLines counts
+
+    Returns
+    -------
+    generator
+        (line number, line) of lines unique to the failing build
+    """
+    diffSettings = getDiffSettings(config)
+    normalizePatterns = getDiffNormalizePatterns(config)
+    lineCacheSize = diffSettings['lineCacheSize']
+    knownLines = LineHashFilter(diffSettings['filterBytes'], diffSettings['hashFunctions'])
+    lineCache = set()
+    diffStats.update({'greenLines': 0, 'failingLines': 0, 'uniqueLines': 0})
+    for line in streamBuildConsoleText(config, greenPath, greenNumber):
+        diffStats['greenLines'] += 1
+        lineKey = getDiffLineKey(line)
+        if lineKey in lineCache:
+            continue
+        if len(lineCache) >= lineCacheSize:
+            lineCache.clear()
+        lineCache.add(lineKey)
+        knownLines.add(normalizeLine(lineKey, normalizePatterns))
+    lineCache.clear()
+    for lineNumber, line in enumerate(streamBuildConsoleText(config, failingPath, failingNumber), 1):
+        diffStats['failingLines'] += 1
+        lineKey = getDiffLineKey(line)
+        if lineKey in lineCache:
+            continue
+        if len(lineCache) >= lineCacheSize:
+            lineCache.clear()
+        lineCache.add(lineKey)
+        normalizedLine = normalizeLine(lineKey, normalizePatterns)
+        if not normalizedLine or normalizedLine in knownLines:
+            continue
+        # Reported lines are added so their repeats are not reported again
+        knownLines.add(normalizedLine)
+        diffStats['uniqueLines'] += 1
+        yield lineNumber, line
+
+def resolveDiffRuns(config, pipeLineName, branchName, failingJob, greenJob=None):
+    """Resolve failing and green run numbers of a diff
+
+    Returns
+    -------
+    tuple
+        (failing number, green number), raises ValueError when a run is not found
+    """
+    failingNumber = getBuildNumber(config, getJobPath(pipeLineName, branchName, failingJob))
+    if failingNumber is None:
+        raise ValueError("Job {} not found".format(failingJob))
+    if greenJob:
+        greenNumber = getBuildNumber(config, getJobPath(pipeLineName, branchName, greenJob))
+    else:
+        greenNumber = findLastGreenRun(config, pipeLineName, branchName, failingNumber)
+    if greenNumber is None:
+        raise ValueError("No successful run found before job {}".format(failingNumber))
+    return failingNumber, greenNumber
+
+def renderDiffLines(config, pipeLineName, branchName, failingNumber, greenNumber):
+    diffStats = {}
+    diffLines = diffConsoleText(config, getJobPath(pipeLineName, branchName, greenNumber), greenNumber, getJobPath(pipeLineName, branchName, failingNumber), failingNumber, diffStats)
+    yield "Lines of job {} not in last green job {}".format(colored(failingNumber, 'red'), colored(greenNumber, 'green'))
+    previousLineNumber = None
+    for lineNumber, line in diffLines:
+        if previousLineNumber is None or lineNumber != previousLineNumber + 1:
+            yield colored("@@ line {} @@".format(lineNumber), 'cyan')
+        yield "{} {}".format(colored("{:>8}:".format(lineNumber), 'yellow'), line)
+        previousLineNumber = lineNumber
+    yield "{:-^70}".format('')
+    yield "{} of {} lines unique to job {} ({} lines in job {})".format(diffStats['uniqueLines'], diffStats['failingLines'], failingNumber, diffStats['greenLines'], greenNumber)
+
+def getJobDiff(config, pipeLineName, branchName, failingJob):
+    try:
+        failingNumber, greenNumber = resolveDiffRuns(config, pipeLineName, branchName, failingJob)
+    except ValueError as e:
+        print(colored(str(e), 'red'))
+        return
+    print("Comparing job {} with last green job {}...".format(failingNumber, greenNumber))
+    reopenDiff = lambda startLine: islice(renderDiffLines(config, pipeLineName, branchName, failingNumber, greenNumber), startLine - 1, None)
+    diffLines = LazyLines(renderDiffLines(config, pipeLineName, branchName, failingNumber, greenNumber), reopenDiff, getRenderSettings(config)['pagerWindowLines'])
+    showLines(config, diffLines, "Job {} vs {}".format(failingNumber, greenNumber))
+
+def fetchRunChangeSets(config, pipeLineName, branchName, jobId):
+    jobRunUrl = buildApiUrl("job/"+pipeLineName+"/job/"+branchName+"/"+jobId+"/api/json", "changeSets")
+    commits = []
+    jobRunResponse = makeRequest(jobRunUrl, "post", config)
+    if len(jobRunResponse['changeSets']) > 0:
+        changeSets = jobRunResponse['changeSets'][0]['items']
+        for changeSet in changeSets:
+            # print(changeSet)
+            msg = changeSet['msg']
+            author = changeSet['author']['fullName']
+            timestamp = changeSet['timestamp']
+            changeSetObject = {'msg': msg, 'author': author, 'timestamp': timestamp}
+            # print(changeSetObject)
+            commits.append(changeSetObject)
+    return commits
+
+def fetchPipeLineBranches(pipeLineItem, config):
+    """Fetch branches of a single pipeline
+
+    Never raises so that one broken pipeline does not abort a refresh
+
+    Parameters
+    ----------
+    pipeLineItem : dict
+        Pipeline item from pipeLineList
+    config : dict
+        config json object
+
+    Returns
+    -------
+    dict
+        name, repo, branches, error and duration (seconds) of the fetch
+    """
+    result = {'name': pipeLineItem['name'], 'repo': pipeLineItem['repo'], 'branches': None, 'error': None}
+    startTime = time.perf_counter()
+    try:
+        result['branches'] = getPipeLineJobs(pipeLineItem['name'], config)
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    result['duration'] = time.perf_counter() - startTime
+    result['fetchedAt'] = int(time.time())
+    return result
+
+def isRepoBranchesStale(config, repo):
+    if repo not in config.get('repoBranches', {}):
+        return True
+    updatedAt = config.get('repoBranchesUpdatedAt', {}).get(repo)
+    if updatedAt is None:
+        return True
+    return time.time() - updatedAt > getRunSettings(config)['branchCacheTtl']
+
+def saveRepoBranches(config, repo, branches, fetchedAt):
+    with configLock:
+        config.setdefault('repoBranches', OrderedDict())[repo] = branches
+        config.setdefault('repoBranchesUpdatedAt', OrderedDict())[repo] = fetchedAt
+        updateConfig(config)
+
+def refreshRepoBranches(config, pipeLineName, repo):
+    result = fetchPipeLineBranches({'name': pipeLineName, 'repo': repo}, config)
+    if not result['error']:
+        saveRepoBranches(config, repo, result['branches'], result['fetchedAt'])
+    return result
+
+def getRepoBranches(config, pipeLineName, repo):
+    """Get cached branches of a repo refreshing them when stale
+
+    A repo without cached branches is fetched right away. Stale branches are
+    returned as they are while a background thread refreshes the cache for
+    the next run so the branch menu is never blocked on jenkins
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    pipeLineName : str
+        Pipeline name of the repo
+    repo : str
+        Repo name
+
+    Returns
+    -------
+    dict
+        url safe branch name to branch name
+    """
+    if repo not in config.get('repoBranches', {}):
+        recordCacheLookup('branchCache', False)
+        print("Fetching branches for {}".format(repo))
+        result = refreshRepoBranches(config, pipeLineName, repo)
+        if result['error']:
+            print(colored("Could not fetch branches: {}".format(result['error']), 'red'))
+            return {}
+        return result['branches']
+    repoBranchesStale = isRepoBranchesStale(config, repo)
+    recordCacheLookup('branchCache', not repoBranchesStale)
+    if repoBranchesStale:
+        refreshResult = {}
+        refreshThread = threading.Thread(target=lambda: refreshResult.update(refreshRepoBranches(config, pipeLineName, repo)), daemon=True)
+        refreshThread.start()
+        atexit.register(finishBranchRefresh, refreshThread, refreshResult, repo)
+    return config['repoBranches'][repo]
+
+def finishBranchRefresh(refreshThread, refreshResult, repo):
+    """Give a background branch refresh a moment to finish when the script exits
+
+    Runs before flushState (atexit is last in first out) so branches fetched
+    in time are saved, a hung jenkins does not keep the script alive. Errors
+    are only printed here as printing from the thread would garble the menus
+    """
+    refreshThread.join(branchRefreshExitWait)
+    if refreshResult.get('error'):
+        print(colored("Could not refresh branches of {}: {}".format(repo, refreshResult['error']), 'yellow'), file=sys.stderr)
+
+def printBranchRefreshResult(result):
+    durationText = "{:.2f}s".format(result['duration'])
+    if result['error']:
+        print("{:<40} {:<10} {:>8}  {}".format(result['repo'], colored('FAILED', 'red'), durationText, result['error']))
+    else:
+        print("{:<40} {:<10} {:>8}  {} branches".format(result['repo'], colored('OK', 'green'), durationText, len(result['branches'])))
+
+def updateRepoBranches(pipeLineList, config):
+    print('Updating all repo branches')
+    excludeList = config['excludedPipeLines']
+    runSettings = getRunSettings(config)
+    pipeLineItems = []
+    for pipeLineItem in pipeLineList:
+        exist_count = excludeList.count(pipeLineItem["name"])
+        if exist_count <= 0:
+            pipeLineItems.append(pipeLineItem)
+
+    results = {}
+    startTime = time.perf_counter()
+    workers = max(1, min(runSettings['branchRefreshWorkers'], len(pipeLineItems)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetchPipeLineBranches, pipeLineItem, config) for pipeLineItem in pipeLineItems]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['repo']] = result
+            printBranchRefreshResult(result)
+
+    # Keep pipeline order and previously known branches of failed pipelines
+    previousRepoBranches = config.get('repoBranches', {})
+    previousUpdatedAt = config.get('repoBranchesUpdatedAt', {})
+    repoBranches = OrderedDict()
+    repoBranchesUpdatedAt = OrderedDict()
+    failures = []
+    for pipeLineItem in pipeLineItems:
+        repo = pipeLineItem["repo"]
+        result = results[repo]
+        if result['error']:
+            failures.append(repo)
+            if repo in previousRepoBranches:
+                repoBranches[repo] = previousRepoBranches[repo]
+                if repo in previousUpdatedAt:
+                    repoBranchesUpdatedAt[repo] = previousUpdatedAt[repo]
+        else:
+            repoBranches[repo] = result['branches']
+            repoBranchesUpdatedAt[repo] = result['fetchedAt']
+    # print(repoBranches)
+    with configLock:
+        config['repoBranches'] = repoBranches
+        config['repoBranchesUpdatedAt'] = repoBranchesUpdatedAt
+        updateConfig(config)
+    totalTime = time.perf_counter() - startTime
+    if failures:
+        print(colored("Failed to update {} of {} repos: {}".format(len(failures), len(pipeLineItems), ', '.join(failures)), 'red'))
+    print("Updated all repos with branches in {:.2f}s".format(totalTime))
+
+def processRepoBranches(repoBranches):
+    keys = repoBranches.keys()
+    values = repoBranches.values()
+    newKeys = []
+    newValues = []
+    processedData = {}
+    for key in keys:
+        newKeys.append(key)
+    for value in values:
+        newValues.append(value)
+    newKeys.append('exit')
+    newValues.append('Exit')
+    processedData['keys'] = newKeys
+    processedData['values'] = newValues
+    return processedData
+
+def getConfigSignature():
+    configStat = os.stat(configFile)
+    return [configStat.st_mtime_ns, configStat.st_size]
+
+def popCommandLineFlag(flagName):
+    if flagName in sys.argv[1:]:
+        sys.argv.remove(flagName)
+        return True
+    return False
+
+def popCommandLineOption(optionName):
+    if optionName in sys.argv[1:-1]:
+        optionIndex = sys.argv.index(optionName)
+        optionValue = sys.argv[optionIndex + 1]
+        del sys.argv[optionIndex:optionIndex + 2]
+        return optionValue
+    return None
+
+def recordStartupTiming(name, startTime):
+    startupTimings[name] = time.perf_counter() - startTime
+
+def printStartupProfile():
+    print("Startup profile", file=sys.stderr)
+    for name, value in startupTimings.items():
+        if isinstance(value, float):
+            value = "{:.1f}ms".format(value * 1000)
+        print("  {:<35} {}".format(name, value), file=sys.stderr)
+
+def printCurrentJobInfo(repoName, branchName):
+    print("Selected repo: {}".format(colored(repoName, 'green', attrs=['bold'])))
+    print("Selected branch: {}".format(colored(branchName, 'green', attrs=['bold'])))
+
+def buildBranchSearchIndex(branchesList, branchesRawList, recentBranches):
+    """Build search index over branch names
+
+    Parameters
+    ----------
+    branchesList : list
+        Branch names shown in the menu
+    branchesRawList : list
+        Url safe branch names in the same order
+    recentBranches : list
+        Url safe names of recently used branches, most recent first
+
+    Returns
+    -------
+    dict
+        lowered names, character sets, name to raw name mapping and recency
+        boosts used by searchBranches
+    """
+    recentRank = {}
+    for rank, rawName in enumerate(recentBranches):
+        recentRank.setdefault(rawName, rank)
+    lowerNames = [branchName.lower() for branchName in branchesList]
+    return {
+        'names': list(branchesList),
+        'lowerNames': lowerNames,
+        'charSets': [frozenset(lowerName) for lowerName in lowerNames],
+        'rawByName': dict(zip(branchesList, branchesRawList)),
+        'boosts': [fuzzyRecentBoost * (len(recentBranches) - recentRank[rawName]) if rawName in recentRank else 0 for rawName in branchesRawList],
+        'lastQuery': None,
+        'lastMatches': None
+    }
+
+def fuzzyScore(query, name):
+    """Score how well query matches name, None when it does not match
+
+    Contiguous matches score highest, then matches on word boundaries
+    (after /, -, _ or .) and consecutive characters of a subsequence
+    """
+    position = name.find(query)
+    if position >= 0:
+        score = 100 + 10 * len(query)
+        if position == 0 or name[position - 1] in fuzzyBoundaries:
+            score += 50
+        return score - position
+    score = 0
+    previousPosition = -1
+    for character in query:
+        position = name.find(character, previousPosition + 1)
+        if position < 0:
+            return None
+        if position == previousPosition + 1:
+            score += 5
+        if position == 0 or name[position - 1] in fuzzyBoundaries:
+            score += 8
+        score += 1 - min(position - previousPosition - 1, 5)
+        previousPosition = position
+    return score
+
+def searchBranches(searchIndex, query):
+    """Ranked branch names matching query
+
+    When query extends the previous query only the previous matches are
+    searched again, so typing stays fast on thousands of branches
+
+    Parameters
+    ----------
+    searchIndex : dict
+        Index from buildBranchSearchIndex
+    query : str
+        Typed filter text
+
+    Returns
+    -------
+    list
+        branch names, best match first
+    """
+    query = query.lower()
+    names = searchIndex['names']
+    lastQuery = searchIndex['lastQuery']
+    if lastQuery is not None and query.startswith(lastQuery):
+        candidates = searchIndex['lastMatches']
+    else:
+        candidates = range(len(names))
+    queryChars = frozenset(query)
+    lowerNames = searchIndex['lowerNames']
+    charSets = searchIndex['charSets']
+    boosts = searchIndex['boosts']
+    rankedMatches = []
+    for index in candidates:
+        if not queryChars <= charSets[index]:
+            continue
+        score = fuzzyScore(query, lowerNames[index]) if query else 0
+        if score is None:
+            continue
+        rankedMatches.append((-(score + boosts[index]), index))
+    rankedMatches.sort()
+    searchIndex['lastQuery'] = query
+    searchIndex['lastMatches'] = sorted(index for score, index in rankedMatches)
+    return [names[index] for score, index in rankedMatches]
+
+def runFuzzyPicker(screen, searchIndex, title):
+    import curses
+    try:
+        curses.use_default_colors()
+        curses.curs_set(0)
+    except curses.error:
+        pass
+    query = ''
+    selected = 0
+    matches = searchBranches(searchIndex, query)
+    while True:
+        screen.erase()
+        maxY, maxX = screen.getmaxyx()
+        screen.addnstr(0, 1, title, maxX - 2)
+        screen.addnstr(1, 1, "Filter: {}".format(query), maxX - 2)
+        screen.addnstr(2, 1, "{} of {} branches (type to filter, arrows to move, ENTER to select)".format(len(matches), len(searchIndex['names'])), maxX - 2)
+        # Only the visible window of matches is drawn
+        visibleRows = max(1, maxY - 4)
+        scrollTop = max(0, selected - visibleRows + 1)
+        for row, name in enumerate(matches[scrollTop:scrollTop + visibleRows]):
+            prefix = '=>' if scrollTop + row == selected else '  '
+            screen.addnstr(4 + row, 1, "{} {}".format(prefix, name), maxX - 2)
+        screen.refresh()
+
+        key = screen.get_wch()
+        if key in ('\n', '\r') or key == curses.KEY_ENTER:
+            if matches:
+                return matches[selected]
+        elif key == curses.KEY_UP:
+            selected = max(0, selected - 1)
+        elif key == curses.KEY_DOWN:
+            selected = min(len(matches) - 1, selected + 1) if matches else 0
+        elif key == curses.KEY_PPAGE:
+            selected = max(0, selected - visibleRows)
+        elif key == curses.KEY_NPAGE:
+            selected = min(len(matches) - 1, selected + visibleRows) if matches else 0
+        elif key in (curses.KEY_BACKSPACE, '\x7f', '\b'):
+            query = query[:-1]
+            matches = searchBranches(searchIndex, query)
+            selected = 0
+        elif key == '\x1b':
+            query = ''
+            matches = searchBranches(searchIndex, query)
+            selected = 0
+        elif isinstance(key, str) and key.isprintable():
+            query += key
+            matches = searchBranches(searchIndex, query)
+            selected = 0
+
+def branchPick(branchesList, branchesRawList, recentBranches=None):
+    import curses
+    if recentBranches is None:
+        recentBranches = []
+    branchData = dict()
+    branchTitle = 'Please choose your branch: '
+    searchIndex = buildBranchSearchIndex(branchesList, branchesRawList, recentBranches)
+    branchOption = curses.wrapper(runFuzzyPicker, searchIndex, branchTitle)
+    branchData['name'] = branchOption
+    branchOption = searchIndex['rawByName'][branchOption]
+    branchData['option'] = branchOption
+    
+    return branchData
+
+def getRecentBranches(config, repoName):
+    # Exit was saved as a branch by earlier versions, it must not be boosted or prefetched
+    return [recentBranch for recentBranch in config.get('recentBranches', {}).get(repoName, []) if recentBranch != 'exit']
+
+def buildQueryParams(queryItems):
+    query = ''
+    for key in queryItems:
+        query+= key + "=" + queryItems[key] + "&"
+    # removing last & from the query string
+    return query[:-1]
+
+def triggerBuild(config, pipeLineName, buildInputs):
+    queryUrl = buildQueryParams(buildInputs)
+    buildUrl = "job/"+pipeLineName+"/buildWithParameters?" + queryUrl
+    # print(buildUrl)
+    return makeRequest(buildUrl, "post", config, retry=False)
+
+def resolveBuildNumber(config, tracker):
+    """Poll queue item of a triggered build until jenkins assigns a build number
+
+    Polls start fast as most items leave the queue within a few seconds and
+    back off for items waiting on an executor
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    tracker : dict
+        Tracker from submitTrackedBuild
+
+    Returns
+    -------
+    dict
+        tracker with buildNumber and buildPath once the build started
+    """
+    buildTrackingSettings = getBuildTrackingSettings(config)
+    interval = buildTrackingSettings['queuePollMinInterval']
+    deadline = time.monotonic() + buildTrackingSettings['timeout']
+    while tracker['status'] == 'QUEUED' and time.monotonic() < deadline:
+        time.sleep(interval)
+        pollTrackedBuild(config, tracker)
+        interval = min(interval * 2, buildTrackingSettings['pollMaxInterval'])
+    return tracker
+
+def waitForTrackedBuild(config, tracker, interval, backoff):
+    """Poll a started build until it finished, timeout passed or Ctrl-C
+
+    Returns
+    -------
+    bool
+        True when the build is no longer IN_PROGRESS
+    """
+    buildTrackingSettings = getBuildTrackingSettings(config)
+    deadline = time.monotonic() + buildTrackingSettings['timeout']
+    try:
+        while tracker['status'] == 'IN_PROGRESS':
+            if time.monotonic() > deadline:
+                print(colored("Stopped waiting after {}s, build keeps running in jenkins".format(buildTrackingSettings['timeout']), 'yellow'))
+                return False
+            time.sleep(interval)
+            pollTrackedBuild(config, tracker)
+            interval = min(interval * backoff, buildTrackingSettings['pollMaxInterval'])
+    except KeyboardInterrupt:
+        print(colored("Stopped waiting, build keeps running in jenkins", 'yellow'))
+        return False
+    return True
+
+def triggerAndFollowBuild(config, pipeLineName, buildInputs, successMessage, errorMessage):
+    """Trigger a build and follow it as soon as it has a build number
+
+    Depending on buildTrackingSettings.followMode the console is tailed
+    (tail), errors are shown once a failed build finished (errors) or only
+    the build number is reported (none)
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    pipeLineName : str
+        Pipeline name
+    buildInputs : dict
+        Build parameters
+    successMessage : str
+        Printed once jenkins accepted the build
+    errorMessage : str
+        Printed when jenkins did not accept the build
+
+    Returns
+    -------
+    dict
+        tracker of the build
+    """
+    tracker = submitTrackedBuild(config, {'service': pipeLineName, 'pipeLineName': pipeLineName, 'parameters': buildInputs})
+    if tracker['status'] == 'ERROR':
+        print(colored(errorMessage, 'red'))
+        return tracker
+    print(colored(successMessage, 'green'))
+    followMode = getBuildTrackingSettings(config)['followMode']
+    print("Waiting for build number...")
+    resolveBuildNumber(config, tracker)
+    if tracker['status'] in ('QUEUED', 'ERROR', 'CANCELLED'):
+        print(colored("Build did not start: {}".format(tracker['error'] or tracker['status']), 'red'))
+        return tracker
+    print("Build {} started: {}".format(colored("#{}".format(tracker['buildNumber']), 'green', attrs=['bold']), config['userInfo']['baseUrl'] + tracker['buildPath']))
+    if followMode == 'none':
+        return tracker
+
+    buildTrackingSettings = getBuildTrackingSettings(config)
+    if followMode == 'tail':
+        if not tailBuildConsoleText(config, tracker['buildPath'], tracker['buildNumber']):
+            return tracker
+        # Console is complete here but build result can take a moment to be recorded
+        finished = waitForTrackedBuild(config, tracker, buildTrackingSettings['queuePollMinInterval'], 1)
+    else:
+        print("Waiting for build to finish...")
+        finished = waitForTrackedBuild(config, tracker, buildTrackingSettings['pollMinInterval'], 1.5)
+    if not finished:
+        return tracker
+    if tracker['status'] == 'ERROR':
+        print(colored("Build #{}: {}".format(tracker['buildNumber'], tracker['error']), 'red'))
+        return tracker
+    print("Build #{} finished with status {}".format(tracker['buildNumber'], getStatusColor(tracker['status'])))
+    if tracker['status'] in ('FAILED', 'ABORTED', 'UNSTABLE'):
+        try:
+            errorPatterns = getErrorPatterns(config)
+        except ValueError as e:
+            print(colored(str(e), 'red'))
+            return tracker
+        consoleLines = streamBuildConsoleText(config, tracker['buildPath'], tracker['buildNumber'])
+        printJobErrors(classifyErrorLines(consoleLines, errorPatterns))
+    return tracker
+
+def serviceScale(config, pipeLineName, serviceScaleInputs):
+    return triggerAndFollowBuild(config, pipeLineName, serviceScaleInputs, "Service is scaled", "Error in scaling")
+
+def promotions(config, pipeLineName, promotionsInputs):
+    return triggerAndFollowBuild(config, pipeLineName, promotionsInputs, "Promoted", "Error in promotion")
+
+def bulkPromotions(config, pipeLineName, bulkPromotionsInputs):
+    return triggerAndFollowBuild(config, pipeLineName, bulkPromotionsInputs, "Bulk Promoted", "Error in bulk promotion")
+
+def getBuildStatus(build):
+    if build['building']:
+        return 'IN_PROGRESS'
+    # Build api reports FAILURE, wfapi and getStatusColor use FAILED
+    return 'FAILED' if build['result'] == 'FAILURE' else build['result']
+
+def getBuildTrackingSettings(config):
+    buildTrackingSettings = dict(defaultBuildTrackingSettings)
+    buildTrackingSettings.update(config.get('buildTrackingSettings', {}))
+    return buildTrackingSettings
+
+def getJenkinsPath(config, url):
+    # Location and executable urls are absolute, requests are made relative to baseUrl
+    baseUrl = config['userInfo']['baseUrl']
+    if url.startswith(baseUrl):
+        return url[len(baseUrl):]
+    return urllib.parse.urlparse(url).path.lstrip('/')
+
+def submitTrackedBuild(config, buildRequest):
+    """Trigger a build and start tracking it through its queue item
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    buildRequest : dict
+        service, pipeLineName and parameters of the build
+
+    Returns
+    -------
+    dict
+        tracker with status QUEUED or ERROR
+    """
+    tracker = {
+        'service': buildRequest['service'],
+        'pipeLineName': buildRequest['pipeLineName'],
+        'parameters': buildRequest['parameters'],
+        'status': 'QUEUED',
+        'queuePath': None,
+        'buildNumber': None,
+        'buildPath': None,
+        'error': None,
+        'submittedAt': time.time()
+    }
+    response = triggerBuild(config, buildRequest['pipeLineName'], buildRequest['parameters'])
+    if response is None:
+        tracker['status'] = 'ERROR'
+        tracker['error'] = "Request failed"
+    elif response.status_code != 201:
+        tracker['status'] = 'ERROR'
+        tracker['error'] = "Unexpected status code {}".format(response.status_code)
+    elif 'Location' not in response.headers:
+        tracker['status'] = 'ERROR'
+        tracker['error'] = "Queue item location missing"
+    else:
+        tracker['queuePath'] = getJenkinsPath(config, response.headers['Location'])
+    return tracker
 
-def getJobErrors(config, pipeLineName, branchName, jobNumber):
-    jobConsoleTextUrl = "job/"+pipeLineName+"/job/"+branchName+"/"+jobNumber+"/consoleText"
-    jobConsoleTextResponse = makeRequest(jobConsoleTextUrl, "post", config)
-    errorsList = re.findall(r'(.*?ERROR:.*?|.*?java\.lang\.Exception:.*?|.*?ABORTED.*?|.*?script\sreturned\sexit\scode\s143.*?)\n', jobConsoleTextResponse)
-    printJobErrors(errorsList)
+def pollTrackedBuild(config, tracker):
+    """Advance tracker by one poll, returns True when its status changed"""
+    previousStatus = tracker['status']
+    if tracker['status'] == 'QUEUED':
+        queueItem = makeRequest(buildApiUrl(tracker['queuePath'] + "api/json", "queueItem"), "get", config)
+        if not isinstance(queueItem, dict):
+            # Queue items are dropped a few minutes after the build started
+            tracker['status'] = 'ERROR'
+            tracker['error'] = "Queue item not found"
+        elif queueItem.get('cancelled'):
+            tracker['status'] = 'CANCELLED'
+        elif queueItem.get('executable'):
+            tracker['buildNumber'] = queueItem['executable']['number']
+            tracker['buildPath'] = getJenkinsPath(config, queueItem['executable']['url'])
+            tracker['status'] = 'IN_PROGRESS'
+        else:
+            tracker['why'] = queueItem.get('why')
+    elif tracker['status'] == 'IN_PROGRESS':
+        build = makeRequest(buildApiUrl(tracker['buildPath'] + "api/json", "buildStatus"), "get", config)
+        if isinstance(build, dict):
+            tracker['status'] = getBuildStatus(build)
+            tracker['failedPolls'] = 0
+        else:
+            # Give up on builds whose status keeps failing after retries
+            tracker['failedPolls'] = tracker.get('failedPolls', 0) + 1
+            if tracker['failedPolls'] >= getBuildTrackingSettings(config)['maxFailedPolls']:
+                tracker['status'] = 'ERROR'
+                tracker['error'] = "Build status not available"
+    return tracker['status'] != previousStatus
 
-def getJobConsoleText(config, pipeLineName, branchName, jobNumber):
-    jobConsoleTextUrl = "job/"+pipeLineName+"/job/"+branchName+"/"+jobNumber+"/consoleText"
-    jobConsoleTextResponse = makeRequest(jobConsoleTextUrl, "post", config)
-    print(jobConsoleTextResponse)
+def isTrackedBuildActive(tracker):
+    return tracker['status'] in ('QUEUED', 'IN_PROGRESS')
 
-def getRunChangeSets(config, pipeLineName, branchName, jobId):
-    jobRunUrl = "job/"+pipeLineName+"/job/"+branchName+"/"+jobId+"/api/json"
-    #?tree=changeSets[items[msg]]"
-    commits = []
-    try:
-        jobRunResponse = makeRequest(jobRunUrl, "post", config)
-        if len(jobRunResponse['changeSets']) > 0:
-            changeSets = jobRunResponse['changeSets'][0]['items']
-            for changeSet in changeSets:
-                # print(changeSet)
-                msg = changeSet['msg']
-                author = changeSet['author']['fullName']
-                timestamp = changeSet['timestamp']
-                changeSetObject = {'msg': msg, 'author': author, 'timestamp': timestamp}
-                # print(changeSetObject)
-                commits.append(changeSetObject)
-    except:
-        print("{}: {}".format(colored("An error occurred while getting change sets for job", 'red'), colored(jobId, 'red')))
-    
-    return commits
+def printTrackedBuilds(trackers):
+    trackedFormat = "{:<35} {:<28} {:>7} {:<21} {}"
+    print("{d[0]:<48} {d[1]:<41} {d[2]:>20} {d[3]:<25} {d[4]}".format(d=[getHeaderText(header) for header in ['Service', 'Pipeline', 'Build', 'Status', 'Details']]))
+    for tracker in trackers:
+        details = tracker['error'] or tracker.get('why') or ''
+        buildNumber = tracker['buildNumber'] if tracker['buildNumber'] is not None else ''
+        status = tracker['status']
+        statusText = getStatusColor(status) if status not in ('QUEUED', 'ERROR', 'CANCELLED') else colored(status, 'yellow' if status == 'QUEUED' else 'red')
+        print(trackedFormat.format(tracker['service'], tracker['pipeLineName'], buildNumber, statusText, details))
+    activeCount = len([tracker for tracker in trackers if isTrackedBuildActive(tracker)])
+    print("{} of {} builds finished".format(len(trackers) - activeCount, len(trackers)))
 
-def updateRepoBranches(pipeLineList, config):
-    print('Updating all repo branches')
-    excludeList = config['excludedPipeLines']
-    repoBranches = {}
-    for pipeLineItem in pipeLineList:
-        name = pipeLineItem["name"]
-        repo = pipeLineItem["repo"]
-        exist_count = excludeList.count(name)
-        if exist_count <= 0:
-            pipeLineBranches = getPipeLineJobs(name, config)
-            repoBranches[repo] = pipeLineBranches
-    # print(repoBranches)
-    config['repoBranches'] = repoBranches
-    updateConfig(config)
-    print("Updated all repos with branches")
+def trackBuilds(config, buildRequests, liveTable=True):
+    """Submit builds concurrently and poll all of them until they finish
 
-def processRepoBranches(repoBranches):
-    keys = repoBranches.keys()
-    values = repoBranches.values()
-    newKeys = []
-    newValues = []
-    processedData = {}
-    for key in keys:
-        newKeys.append(key)
-    for value in values:
-        newValues.append(value)
-    newKeys.append('exit')
-    newValues.append('Exit')
-    processedData['keys'] = newKeys
-    processedData['values'] = newValues
-    return processedData
+    Parameters
+    ----------
+    config : dict
+        config json object
+    buildRequests : list
+        dict items with service, pipeLineName and parameters
+    liveTable : bool
+        Redraw status table after every poll
 
-def printCurrentJobInfo(repoName, branchName):
-    print("Selected repo: {}".format(colored(repoName, 'green', attrs=['bold'])))
-    print("Selected branch: {}".format(colored(branchName, 'green', attrs=['bold'])))
+    Returns
+    -------
+    list
+        trackers with final status, build number and error
+    """
+    buildTrackingSettings = getBuildTrackingSettings(config)
+    workers = buildTrackingSettings['workers']
+    trackers = [None] * len(buildRequests)
+    for index, tracker in runConcurrently(buildRequests, lambda buildRequest: submitTrackedBuild(config, buildRequest), workers):
+        if tracker.get('service') is None:
+            # runConcurrently turned an exception into an error record
+            tracker = dict(buildRequests[index], status='ERROR', queuePath=None, buildNumber=None, buildPath=None, error=tracker['error'], why=None, submittedAt=time.time())
+        trackers[index] = tracker
 
-def branchPick(branchesList, branchesRawList):
-    branchData = dict()
-    branchTitle = 'Please choose your branch: '
-    branchOption, branchIndex = pick(branchesList, branchTitle, indicator='=>', default_index=0)
-    branchData['name'] = branchOption
-    branchOption = branchesRawList[branchesList.index(branchOption)]
-    branchData['option'] = branchOption
-    
-    return branchData
+    interval = buildTrackingSettings['pollMinInterval']
+    deadline = time.monotonic() + buildTrackingSettings['timeout']
+    try:
+        while True:
+            if liveTable:
+                if sys.stdout.isatty():
+                    # Clear screen and move cursor to top left
+                    sys.stdout.write("\033[2J\033[H")
+                printTrackedBuilds(trackers)
+            activeTrackers = [tracker for tracker in trackers if isTrackedBuildActive(tracker)]
+            if not activeTrackers:
+                return trackers
+            if time.monotonic() > deadline:
+                for tracker in activeTrackers:
+                    tracker['error'] = "Stopped tracking after {}s".format(buildTrackingSettings['timeout'])
+                return trackers
+            time.sleep(interval)
+            changed = False
+            for index, result in runConcurrently(activeTrackers, lambda tracker: {'changed': pollTrackedBuild(config, tracker)}, workers):
+                changed = changed or result.get('changed', False)
+            # Poll quickly while builds move through queue, back off while they run
+            if changed:
+                interval = buildTrackingSettings['pollMinInterval']
+            else:
+                interval = min(interval * 1.5, buildTrackingSettings['pollMaxInterval'])
+    except KeyboardInterrupt:
+        print(colored("Stopped tracking, builds keep running in jenkins", 'yellow'))
+        return trackers
 
-def buildQueryParams(queryItems):
-    query = ''
-    for key in queryItems:
-        query+= key + "=" + queryItems[key] + "&"
-    # removing last & from the query string
-    return query[:-1]
+def parseServiceTag(serviceTag):
+    repo, separator, tag = serviceTag.strip().partition('=')
+    if not separator or not repo:
+        raise ValueError("Service should be of format <repo>=<tag>: {}".format(serviceTag))
+    validateTag(tag)
+    return repo, tag
 
-def serviceScale(config, pipeLineName, serviceScaleInputs):
-    queryUrl = buildQueryParams(serviceScaleInputs)
-    serviceScaleUrl = "job/"+pipeLineName+"/buildWithParameters?" + queryUrl
-    # print(serviceScaleUrl)
-    serviceScaleResponse = makeRequest(serviceScaleUrl, "post", config)
-    if serviceScaleResponse.status_code == 201:
-        print(colored("Service is scaled", 'green'))
-    else:
-        print(colored("Error in scaling", 'red'))
+def buildPromotionRequests(environment, serviceTags, promotionsPipeLine='OpenShift-Promotions'):
+    buildRequests = []
+    for serviceTag in serviceTags:
+        repo, tag = parseServiceTag(serviceTag)
+        buildRequests.append({'service': repo, 'pipeLineName': promotionsPipeLine, 'parameters': {'ENVIRONMENT': environment, 'IMAGE_TAG': tag, 'REPO_NAME': repo}})
+    return buildRequests
 
-def promotions(config, pipeLineName, promotionsInputs):
-    queryUrl = buildQueryParams(promotionsInputs)
-    promotionsUrl = "job/"+pipeLineName+"/buildWithParameters?" + queryUrl
-    # print(promotionsUrl)
-    promotionsResponse = makeRequest(promotionsUrl, "post", config)
-    # print(promotionsResponse)
-    if promotionsResponse.status_code == 201:
-        print(colored("Promoted", 'green'))
-    else:
-        print(colored("Error in promotion", 'red'))
+def buildScaleRequests(environment, replicas, services, scalePipeLine):
+    return [{'service': service, 'pipeLineName': scalePipeLine, 'parameters': {'ENVIRONMENT': environment, 'REPLICA': str(replicas), 'MICROSERVICES': service}} for service in services]
 
-def bulkPromotions(config, pipeLineName, bulkPromotionsInputs):
-    queryUrl = buildQueryParams(bulkPromotionsInputs)
-    promotionsUrl = "job/"+pipeLineName+"/buildWithParameters?" + queryUrl
-    # print(promotionsUrl)
-    promotionsResponse = makeRequest(promotionsUrl, "post", config)
-    # print(promotionsResponse)
-    if promotionsResponse.status_code == 201:
-        print(colored("Bulk Promoted", 'green'))
+def parallelPromotions(config, pipeLineName, parallelPromotionsInputs):
+    buildRequests = buildPromotionRequests(parallelPromotionsInputs['ENVIRONMENT'], parallelPromotionsInputs['SERVICES'], pipeLineName)
+    trackers = trackBuilds(config, buildRequests)
+    failedTrackers = [tracker for tracker in trackers if tracker['status'] != 'SUCCESS']
+    if failedTrackers:
+        print(colored("{} of {} promotions did not succeed".format(len(failedTrackers), len(trackers)), 'red'))
     else:
-        print(colored("Error in bulk promotion", 'red'))
+        print(colored("All {} services promoted".format(len(trackers)), 'green'))
 
 def checkTag(str):
     # using regular expression to check if a string contains
@@ -408,18 +3123,31 @@ def checkTag(str):
         return True
     else:
         return False
+
+def validateEnvironment(environment, environments):
+    if environment not in environments:
+        raise ValueError("Environment should be either {}".format(','.join(environments)))
+
+def validateReplica(replica):
+    replicaRange = range(0, 21)
+    if int(replica) not in replicaRange:
+        raise ValueError("Replica number is not in range of 0 - 20")
+
+def validateTag(tag):
+    if len(tag) != 6:
+        raise ValueError("Tag should be of length 6 characters")
+    elif checkTag(tag) == False:
+        raise ValueError("Tag should be alphanumeric")
+    elif tag.isupper() == False:
+        raise ValueError("Tag should be uppercase")
     
 def takeScaleInputs():
     try:
         serviceScaleInputs = {'ENVIRONMENT': '', 'REPLICA': '', 'MICROSERVICES': ''}
         serviceScaleInputs['ENVIRONMENT'] = input("Input Environment (dev,qa,ua): ")
-        environments = ['dev', 'qa', 'ua']
-        replicaRange = range(0, 21)
-        if serviceScaleInputs['ENVIRONMENT'] not in environments:
-            raise ValueError("Environment should be either dev,qa,ua")
+        validateEnvironment(serviceScaleInputs['ENVIRONMENT'], scaleEnvironments)
         serviceScaleInputs['REPLICA'] = input("Input Replicas (0-20): ")
-        if int(serviceScaleInputs['REPLICA']) not in replicaRange:
-            raise ValueError("Replica number is not in range of 0 - 20")
+        validateReplica(serviceScaleInputs['REPLICA'])
         serviceScaleInputs['MICROSERVICES'] = input("Input microservices separated by comma (om-order-v1-0,om-order-create-v1-0): ")
         return serviceScaleInputs
     except Exception as e:
@@ -429,28 +3157,43 @@ def takePromotionsInputs():
     try:
         promotionsInputs = {'ENVIRONMENT': '', 'IMAGE_TAG': '', 'REPO_NAME': ''}
         promotionsInputs['ENVIRONMENT'] = input("Input Environment (dev,qa,ua): ")
-        environments = ['dev', 'qa', 'ua']
-        if promotionsInputs['ENVIRONMENT'] not in environments:
-            raise ValueError("Environment should be either dev,qa,ua")
+        validateEnvironment(promotionsInputs['ENVIRONMENT'], promotionEnvironments)
         promotionsInputs['IMAGE_TAG'] = input("Input tag (Ex. 31E7E3): ")
-        if len(promotionsInputs['IMAGE_TAG']) != 6:
-            raise ValueError("Tag should be of length 6 characters")
-        elif checkTag(promotionsInputs['IMAGE_TAG']) == False:
-            raise ValueError("Tag should be alphanumeric")
-        elif promotionsInputs['IMAGE_TAG'].isupper() == False:
-            raise ValueError("Tag should be uppercase")
+        validateTag(promotionsInputs['IMAGE_TAG'])
         promotionsInputs['REPO_NAME'] = input("Input repo (Ex. om-order): ")
         return promotionsInputs
     except Exception as e:
         print(e)
 
+def buildServicesString(services):
+    servicesString = ''
+    for key in services:
+        servicesString+= key + "\n"
+    return servicesString
+
+def takeParallelPromotionsInputs():
+    try:
+        parallelPromotionsInputs = {'ENVIRONMENT': '', 'SERVICES': []}
+        parallelPromotionsInputs['ENVIRONMENT'] = input("Input Environment (dev,qa,ua): ")
+        validateEnvironment(parallelPromotionsInputs['ENVIRONMENT'], promotionEnvironments)
+        print("Input services (Ex. om-order=67EC11) (Once pasted ENTER -> CTRL+D to exit from input prompt): ")
+        while True:
+            try:
+                line = input("")
+            except EOFError:
+                break
+            if line.strip():
+                parseServiceTag(line)
+                parallelPromotionsInputs['SERVICES'].append(line.strip())
+        return parallelPromotionsInputs
+    except Exception as e:
+        print(e)
+
 def takeBulkPromotionsInputs():
     try:
         promotionsInputs = {'DEST_ENV': '', 'SERVICES': ''}
         promotionsInputs['DEST_ENV'] = input("Input Environment (DEV,QA,UA): ")
-        environments = ['DEV', 'QA', 'UA']
-        if promotionsInputs['DEST_ENV'] not in environments:
-            raise ValueError("Environment should be either DEV,QA,UA")
+        validateEnvironment(promotionsInputs['DEST_ENV'], bulkPromotionEnvironments)
         print("Input services (Ex. om-order=67EC11) (Once pasted ENTER -> CTRL+D to exit from input prompt): ")
         services = []
         while True:
@@ -459,35 +3202,60 @@ def takeBulkPromotionsInputs():
             except EOFError:
                 break
             services.append(line)
-        servicesString = ''
-        for key in services:
-            servicesString+= key + "\n"
-        promotionsInputs['SERVICES'] = servicesString
+        promotionsInputs['SERVICES'] = buildServicesString(services)
         return promotionsInputs
     except Exception as e:
         print(e)
 
-def handleRunActions(runActions = ['Get Runs', 'Get Errors', 'Get Console Text', 'Exit']):
+def handleRunActions(runActions = ['Get Runs', 'Stage History', 'Get Errors', 'Diff With Last Green', 'Get Console Text', 'Search Console', 'Tail Console', 'Exit']):
+    from pick import pick
     runTitle = 'Please choose your actions:'
     runOption, runIndex = pick(runActions, runTitle, indicator='=>', default_index=0)
 
     if runOption == 'Get Runs':
         getJobRuns(config, pipeLineName, branchOption)
     
+    elif runOption == 'Stage History':
+        print("Input number of runs (default {}):".format(getHistorySettings(config)['runs']))
+        runCount = input().strip()
+        getStageHistory(config, pipeLineName, branchOption, int(runCount) if runCount.isdigit() else None)
+    
     elif runOption == 'Get Errors':
         print("Input Job Number:")
         jobNumber = str(input())
         getJobErrors(config, pipeLineName, branchOption, jobNumber)
     
+    elif runOption == 'Diff With Last Green':
+        print("Input failing Job Number (default lastFailedBuild):")
+        jobNumber = str(input()).strip() or 'lastFailedBuild'
+        getJobDiff(config, pipeLineName, branchOption, jobNumber)
+    
     elif runOption == 'Get Console Text':
         print("Input Job Number:")
         jobNumber = str(input())
         getJobConsoleText(config, pipeLineName, branchOption, jobNumber)
     
+    elif runOption == 'Search Console':
+        print("Input Job Number:")
+        jobNumber = str(input())
+        print("Input regular expression:")
+        pattern = input()
+        getJobConsoleMatches(config, pipeLineName, branchOption, jobNumber, pattern)
+    
+    elif runOption == 'Tail Console':
+        print("Input Job Number:")
+        jobNumber = str(input())
+        tailConsoleText(config, pipeLineName, branchOption, jobNumber)
+    
     elif runOption == 'Promotions':
         promotionsInputs = takePromotionsInputs()
         promotions(config, pipeLineName, promotionsInputs)
     
+    elif runOption == 'Parallel Promotions':
+        parallelPromotionsInputs = takeParallelPromotionsInputs()
+        if parallelPromotionsInputs:
+            parallelPromotions(config, pipeLineName, parallelPromotionsInputs)
+    
     elif runOption == 'Bulk Promotions':
         bulkPromotionsInputs = takeBulkPromotionsInputs()
         print("Sending request to Bulk Promotions")
@@ -522,6 +3290,879 @@ def checkUserInfo(config):
         print("Email: {}".format(colored(config['userInfo']['email'], 'green', attrs=['bold'])))
         time.sleep(1)
 
+def getDashboardSettings(config):
+    dashboardSettings = dict(defaultDashboardSettings)
+    dashboardSettings.update(config.get('dashboardSettings', {}))
+    return dashboardSettings
+
+def getDashboardTargets(config, branch, allBranches):
+    dashboardTargets = []
+    for pipeLineItem in getBatchPipeLines(config):
+        repo = pipeLineItem['repo']
+        if allBranches:
+            branchOptions = list(config.get('repoBranches', {}).get(repo, {}).keys())
+        else:
+            branchOptions = [urllib.parse.quote(branch, safe='')]
+        for branchOption in branchOptions:
+            dashboardTargets.append({
+                'repo': repo,
+                'pipeLineName': pipeLineItem['name'],
+                'branchName': urllib.parse.unquote(branchOption),
+                'branchOption': branchOption
+            })
+    return dashboardTargets
+
+def fetchLatestRunStatus(config, target):
+    lastBuildUrl = buildApiUrl("job/"+target['pipeLineName']+"/job/"+target['branchOption']+"/lastBuild/api/json", "lastBuild")
+    record = {'repo': target['repo'], 'pipeLineName': target['pipeLineName'], 'branch': target['branchName']}
+    lastBuild = makeRequest(lastBuildUrl, "get", config)
+    if not isinstance(lastBuild, dict):
+        statusCode = getattr(lastBuild, 'status_code', None)
+        record['error'] = "No runs found" if statusCode == 404 else "Request failed"
+        return record
+    record['job'] = lastBuild['number']
+    record['status'] = getBuildStatus(lastBuild)
+    record['timestamp'] = lastBuild['timestamp']
+    record['durationMillis'] = lastBuild['duration']
+    return record
+
+def fetchDashboardStatuses(config, targets, workers):
+    # Request rate is limited by the request scheduler shared with every other call
+    return runConcurrently(targets, lambda target: fetchLatestRunStatus(config, target), workers)
+
+def printDashboard(records):
+    dashboardFormat = "{:<35} {:<30} {:>6} {:<21} {:<22} {:>9}"
+    print("{d[0]:<48} {d[1]:<43} {d[2]:>19} {d[3]:<25} {d[4]:<35} {d[5]:>22}".format(d=[getHeaderText(header) for header in ['Repo', 'Branch', 'Job', 'Status', 'Started', 'Duration']]))
+    for record in records:
+        if record.get('error'):
+            print(dashboardFormat.format(record['repo'], record['branch'], '', colored(record['error'], 'red'), '', ''))
+            continue
+        started = datetime.fromtimestamp(record['timestamp'] / 1000).strftime('%b %d %I:%M %p')
+        minutes, seconds = mil_convert(record['durationMillis'])
+        duration = "{}m {}s".format(minutes, seconds) if record['status'] != 'IN_PROGRESS' else ''
+        print(dashboardFormat.format(record['repo'], record['branch'], record['job'], getStatusColor(record['status']), started, duration))
+
+def runDashboard(config, branch=None, allBranches=False, interval=None, outputFormat='text', output=None):
+    """Show latest run status of every pipeline
+
+    The first pass fetches all pipelines, following passes only poll runs
+    which are still in progress (or failed to load) until a full refresh is due
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    branch : str
+        Branch shown for every pipeline, defaults to dashboardSettings.branch
+    allBranches : bool
+        Show every branch in repoBranches instead of a single branch
+    interval : int
+        Seconds between refreshes, None renders once
+    outputFormat : str
+        text, json or ndjson
+    output : file
+        Stream receiving json output
+
+    Returns
+    -------
+    int
+        Number of pipelines which could not be fetched
+    """
+    dashboardSettings = getDashboardSettings(config)
+    branch = branch or dashboardSettings['branch']
+    targets = getDashboardTargets(config, branch, allBranches)
+    records = {}
+    pendingIndexes = list(range(len(targets)))
+    lastFullRefresh = time.monotonic()
+    try:
+        while True:
+            pendingTargets = [targets[index] for index in pendingIndexes]
+            for pendingIndex, record in fetchDashboardStatuses(config, pendingTargets, dashboardSettings['workers']):
+                records[pendingIndexes[pendingIndex]] = record
+            orderedRecords = [records[index] for index in range(len(targets))]
+            if outputFormat == 'text':
+                if interval:
+                    # Clear screen and move cursor to top left
+                    sys.stdout.write("\033[2J\033[H")
+                printDashboard(orderedRecords)
+            else:
+                emitBatchRecords(enumerate(orderedRecords), outputFormat, output, None)
+            if not interval:
+                return len([record for record in orderedRecords if record.get('error')])
+            print("Refreshing every {}s, CTRL+C to exit".format(interval))
+            time.sleep(interval)
+            if time.monotonic() - lastFullRefresh >= dashboardSettings['fullRefreshInterval']:
+                pendingIndexes = list(range(len(targets)))
+                lastFullRefresh = time.monotonic()
+            else:
+                pendingIndexes = [index for index in range(len(targets)) if records[index].get('error') or records[index]['status'] == 'IN_PROGRESS']
+    except KeyboardInterrupt:
+        print("Exiting...")
+        return 0
+
+def batchDashboard(config, args, output):
+    return runDashboard(config, args.branch, args.all_branches, args.interval, args.format, output)
+
+def findPipeLine(config, repoOrPipeLine):
+    for pipeLineItem in config['pipeLineList']:
+        if repoOrPipeLine in (pipeLineItem['repo'], pipeLineItem['name']):
+            return pipeLineItem
+    raise ValueError("Unknown repo or pipeline: {}".format(repoOrPipeLine))
+
+def getBatchPipeLines(config):
+    excludeList = config['excludedPipeLines']
+    return [pipeLineItem for pipeLineItem in config['pipeLineList'] if pipeLineItem['name'] not in excludeList]
+
+def resolveBatchTargets(config, targets, allPipeLines, defaultBranch):
+    """Resolve repo[:branch] arguments into pipeline and branch information
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    targets : list
+        Items of repo or pipeline name optionally followed by :branch
+    allPipeLines : bool
+        Add every pipeline which is not excluded
+    defaultBranch : str
+        Branch used for targets without one
+
+    Returns
+    -------
+    list
+        dict items with repo, pipeLineName, branchName and branchOption
+    """
+    targetItems = list(targets)
+    if allPipeLines:
+        targetItems += [pipeLineItem['repo'] for pipeLineItem in getBatchPipeLines(config)]
+    resolvedTargets = []
+    for targetItem in targetItems:
+        repoOrPipeLine, separator, branch = targetItem.partition(':')
+        pipeLineItem = findPipeLine(config, repoOrPipeLine)
+        branch = branch or defaultBranch
+        if not branch:
+            raise ValueError("No branch given for {}, use {}:<branch> or --branch".format(repoOrPipeLine, repoOrPipeLine))
+        branchName = urllib.parse.unquote(branch)
+        resolvedTargets.append({
+            'repo': pipeLineItem['repo'],
+            'pipeLineName': pipeLineItem['name'],
+            'branchName': branchName,
+            'branchOption': urllib.parse.quote(branchName, safe='')
+        })
+    return resolvedTargets
+
+def runConcurrently(items, worker, maxWorkers):
+    """Run worker for every item on a thread pool
+
+    Exceptions are turned into an error entry so one failing item does not
+    stop the others
+
+    Parameters
+    ----------
+    items : list
+        Work items
+    worker : function
+        Called with an item and returns a dict record
+    maxWorkers : int
+        Maximum number of items processed at once
+
+    Returns
+    -------
+    generator
+        (index, record) in completion order
+    """
+    def runWorker(item):
+        try:
+            return worker(item)
+        except Exception as e:
+            return {'error': str(e) or type(e).__name__}
+
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(maxWorkers, len(items)))) as executor:
+        futures = {executor.submit(runWorker, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def emitBatchRecords(indexedRecords, outputFormat, output, printRecord):
+    """Write batch records in requested output format
+
+    ndjson records are written as soon as they complete, json and text keep
+    the order in which targets were given
+
+    Parameters
+    ----------
+    indexedRecords : iterable
+        (index, record) items
+    outputFormat : str
+        text, json or ndjson
+    output : file
+        Stream receiving the records
+    printRecord : function
+        Prints a record for text output
+
+    Returns
+    -------
+    int
+        Number of records with an error
+    """
+    errorCount = 0
+    records = {}
+    for index, record in indexedRecords:
+        if record.get('error'):
+            errorCount += 1
+        if outputFormat == 'ndjson':
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+        else:
+            records[index] = record
+    orderedRecords = [records[index] for index in sorted(records)]
+    if outputFormat == 'json':
+        output.write(json.dumps(orderedRecords, indent=4) + "\n")
+    elif outputFormat == 'text':
+        for record in orderedRecords:
+            if record.get('error'):
+                print(colored("{}: {}".format(record.get('repo', ''), record['error']), 'red'))
+            else:
+                printRecord(record)
+    return errorCount
+
+def batchTargetRecord(target):
+    return {'repo': target['repo'], 'pipeLineName': target['pipeLineName'], 'branch': target['branchName']}
+
+def batchRuns(config, args, output):
+    targets = resolveBatchTargets(config, args.targets, args.all, args.branch)
+
+    def fetchTargetRuns(target):
+        record = batchTargetRecord(target)
+        try:
+            record['runs'] = fetchJobRuns(config, target['pipeLineName'], target['branchOption'], args.limit)
+        except Exception as e:
+            record['error'] = str(e) or type(e).__name__
+        return record
+
+    def printRunsRecord(record):
+        print("\n")
+        printCurrentJobInfo(record['repo'], record['branch'])
+        for runItem in record['runs']:
+            printRun(runItem)
+
+    return emitBatchRecords(runConcurrently(targets, fetchTargetRuns, args.workers), args.format, output, printRunsRecord)
+
+def batchHistory(config, args, output):
+    targets = resolveBatchTargets(config, args.targets, args.all, args.branch)
+
+    def fetchTargetHistory(target):
+        record = batchTargetRecord(target)
+        try:
+            stageHistory = fetchStageHistory(config, target['pipeLineName'], target['branchOption'], args.runs)
+            record['runIds'] = list(stageHistory['runIds'])
+            record['stages'] = analyzeStageHistory(config, stageHistory)
+            record['stageHistory'] = stageHistory
+        except Exception as e:
+            record['error'] = str(e) or type(e).__name__
+        return record
+
+    def printHistoryRecord(record):
+        print("\n")
+        printCurrentJobInfo(record['repo'], record['branch'])
+        printStageStats(record['stageHistory'], record['stages'])
+
+    def historyRecords():
+        for index, record in runConcurrently(targets, fetchTargetHistory, args.workers):
+            # Columns are only needed for text output
+            if args.format != 'text':
+                record.pop('stageHistory', None)
+            yield index, record
+
+    return emitBatchRecords(historyRecords(), args.format, output, printHistoryRecord)
+
+def batchDiff(config, args, output):
+    targets = resolveBatchTargets(config, args.targets, args.all, args.branch)
+    maxLines = getDiffSettings(config)['maxLines']
+
+    def fetchTargetDiff(target):
+        record = batchTargetRecord(target)
+        try:
+            failingNumber, greenNumber = resolveDiffRuns(config, target['pipeLineName'], target['branchOption'], args.job, args.green)
+            record['job'] = failingNumber
+            record['greenJob'] = greenNumber
+            diffStats = {}
+            diffLines = diffConsoleText(config, getJobPath(target['pipeLineName'], target['branchOption'], greenNumber), greenNumber, getJobPath(target['pipeLineName'], target['branchOption'], failingNumber), failingNumber, diffStats)
+            record['lines'] = [{'line': lineNumber, 'text': line} for lineNumber, line in islice(diffLines, maxLines)]
+            # Counting the rest keeps uniqueLines exact while only maxLines are kept
+            for _ in diffLines:
+                pass
+            record.update(diffStats)
+            record['truncated'] = diffStats['uniqueLines'] > maxLines
+        except Exception as e:
+            record['error'] = str(e) or type(e).__name__
+        return record
+
+    def printDiffRecord(record):
+        print("\n")
+        printCurrentJobInfo(record['repo'], record['branch'])
+        print("Lines of job {} not in last green job {}".format(colored(record['job'], 'red'), colored(record['greenJob'], 'green')))
+        for diffLine in record['lines']:
+            print("{} {}".format(colored("{:>8}:".format(diffLine['line']), 'yellow'), diffLine['text']))
+        print("{:-^70}".format(''))
+        print("{} of {} lines unique to job {}{}".format(record['uniqueLines'], record['failingLines'], record['job'], ", first {} shown".format(maxLines) if record['truncated'] else ''))
+
+    return emitBatchRecords(runConcurrently(targets, fetchTargetDiff, args.workers), args.format, output, printDiffRecord)
+
+def collectJobErrors(config, pipeLineName, branchName, jobNumber):
+    consoleLines = streamConsoleText(config, pipeLineName, branchName, jobNumber)
+    errors = []
+    for lineNumber, category, line in classifyErrorLines(consoleLines, getErrorPatterns(config)):
+        errors.append({'line': lineNumber, 'category': category, 'text': line})
+    return errors
+
+def batchErrors(config, args, output):
+    targets = resolveBatchTargets(config, args.targets, args.all, args.branch)
+    # Invalid patterns are an input error (exit code 2), not a failure of every target
+    getErrorPatterns(config)
+
+    def fetchTargetErrors(target):
+        record = batchTargetRecord(target)
+        record['job'] = args.job
+        try:
+            record['errors'] = collectJobErrors(config, target['pipeLineName'], target['branchOption'], args.job)
+        except Exception as e:
+            record['error'] = str(e) or type(e).__name__
+        return record
+
+    def printErrorsRecord(record):
+        print("\n")
+        printCurrentJobInfo(record['repo'], record['branch'])
+        printJobErrors((error['line'], error['category'], error['text']) for error in record['errors'])
+
+    return emitBatchRecords(runConcurrently(targets, fetchTargetErrors, args.workers), args.format, output, printErrorsRecord)
+
+def batchConsole(config, args, output):
+    # Logs can be huge, targets are streamed one after another instead of being held in memory
+    targets = resolveBatchTargets(config, args.targets, args.all, args.branch)
+    if args.grep is not None:
+        try:
+            re.compile(args.grep)
+        except re.error as e:
+            raise ValueError("Invalid regular expression: {}".format(e))
+    for target in targets:
+        if args.grep is not None:
+            numberedLines = searchConsoleText(config, target['pipeLineName'], target['branchOption'], args.job, args.grep)
+        else:
+            consoleLines = streamConsoleText(config, target['pipeLineName'], target['branchOption'], args.job, args.from_line, args.lines)
+            numberedLines = enumerate(consoleLines, args.from_line)
+        if args.format == 'ndjson':
+            record = batchTargetRecord(target)
+            record['job'] = args.job
+            for lineNumber, line in numberedLines:
+                record['line'] = lineNumber
+                record['text'] = line
+                output.write(json.dumps(record) + "\n")
+        else:
+            if len(targets) > 1:
+                printCurrentJobInfo(target['repo'], target['branchName'])
+            for lineNumber, line in numberedLines:
+                if args.grep is not None:
+                    output.write("{}:{}\n".format(lineNumber, line))
+                else:
+                    output.write(line + "\n")
+    return 0
+
+def triggerBatchBuild(config, pipeLineName, buildInputs):
+    record = {'pipeLineName': pipeLineName, 'parameters': buildInputs}
+    response = triggerBuild(config, pipeLineName, buildInputs)
+    if response is None:
+        record['error'] = "Request failed"
+        return record
+    record['statusCode'] = response.status_code
+    if response.status_code == 201:
+        record['status'] = 'triggered'
+    else:
+        record['error'] = "Unexpected status code {}".format(response.status_code)
+    return record
+
+def printTriggerRecord(record):
+    print("{} {}".format(colored('Triggered', 'green'), record['pipeLineName']), record['parameters'])
+
+def emitTrackedBuilds(config, buildRequests, args, output):
+    # Live table only makes sense for text output, json gets final states
+    trackers = trackBuilds(config, buildRequests, liveTable=args.format == 'text')
+    records = []
+    for tracker in trackers:
+        record = dict(tracker)
+        if record['status'] not in ('SUCCESS', 'QUEUED', 'IN_PROGRESS') and not record['error']:
+            record['error'] = "Build finished with status {}".format(record['status'])
+        records.append(record)
+    if args.format == 'text':
+        return len([record for record in records if record['error']])
+    return emitBatchRecords(enumerate(records), args.format, output, None)
+
+def batchPromote(config, args, output):
+    validateEnvironment(args.env, promotionEnvironments)
+    serviceTags = []
+    for repo in args.repos:
+        if '=' not in repo:
+            if not args.tag:
+                raise ValueError("No tag given for {}, use {}=<tag> or --tag".format(repo, repo))
+            repo = "{}={}".format(repo, args.tag)
+        serviceTags.append(repo)
+    buildRequests = buildPromotionRequests(args.env, serviceTags, args.pipeline)
+    if args.wait:
+        return emitTrackedBuilds(config, buildRequests, args, output)
+
+    def promoteRepo(buildRequest):
+        record = triggerBatchBuild(config, buildRequest['pipeLineName'], buildRequest['parameters'])
+        record['repo'] = buildRequest['service']
+        return record
+
+    return emitBatchRecords(runConcurrently(buildRequests, promoteRepo, args.workers), args.format, output, printTriggerRecord)
+
+def batchBulkPromote(config, args, output):
+    validateEnvironment(args.env, bulkPromotionEnvironments)
+    services = args.services
+    if not services or services == ['-']:
+        services = [line.strip() for line in sys.stdin if line.strip()]
+    bulkPromotionsInputs = {'DEST_ENV': args.env, 'SERVICES': buildServicesString(services)}
+    if args.wait:
+        buildRequests = [{'service': ','.join(services), 'pipeLineName': args.pipeline, 'parameters': bulkPromotionsInputs}]
+        return emitTrackedBuilds(config, buildRequests, args, output)
+    record = triggerBatchBuild(config, args.pipeline, bulkPromotionsInputs)
+    return emitBatchRecords([(0, record)], args.format, output, printTriggerRecord)
+
+def batchScale(config, args, output):
+    validateEnvironment(args.env, scaleEnvironments)
+    validateReplica(args.replicas)
+    if args.parallel:
+        buildRequests = buildScaleRequests(args.env, args.replicas, args.services, args.pipeline)
+    else:
+        buildRequests = [{'service': ','.join(args.services), 'pipeLineName': args.pipeline, 'parameters': {'ENVIRONMENT': args.env, 'REPLICA': str(args.replicas), 'MICROSERVICES': ','.join(args.services)}}]
+    if args.wait:
+        return emitTrackedBuilds(config, buildRequests, args, output)
+
+    def scaleServices(buildRequest):
+        return triggerBatchBuild(config, buildRequest['pipeLineName'], buildRequest['parameters'])
+
+    return emitBatchRecords(runConcurrently(buildRequests, scaleServices, args.workers), args.format, output, printTriggerRecord)
+
+def batchRefreshBranches(config, args, output):
+    if args.repos:
+        pipeLineItems = [findPipeLine(config, repo) for repo in args.repos]
+    else:
+        pipeLineItems = getBatchPipeLines(config)
+    results = {}
+
+    def refreshPipeLine(pipeLineItem):
+        result = fetchPipeLineBranches(pipeLineItem, config)
+        results[result['repo']] = result
+        record = {'repo': result['repo'], 'pipeLineName': result['name'], 'durationSeconds': round(result['duration'], 3)}
+        if result['error']:
+            record['error'] = result['error']
+        else:
+            record['branches'] = sorted(result['branches'].values())
+        return record
+
+    def printRefreshRecord(record):
+        print("{:<40} {:<10} {:>8}  {} branches".format(record['repo'], colored('OK', 'green'), "{:.2f}s".format(record['durationSeconds']), len(record['branches'])))
+
+    errorCount = emitBatchRecords(runConcurrently(pipeLineItems, refreshPipeLine, args.workers), args.format, output, printRefreshRecord)
+    # Single config write for all refreshed repos
+    with configLock:
+        for repo, result in results.items():
+            if not result['error']:
+                config.setdefault('repoBranches', OrderedDict())[repo] = result['branches']
+                config.setdefault('repoBranchesUpdatedAt', OrderedDict())[repo] = result['fetchedAt']
+        updateConfig(config)
+    return errorCount
+
+def getDaemonSettings(config):
+    daemonSettings = dict(defaultDaemonSettings)
+    daemonSettings.update(config.get('daemonSettings', {}))
+    return daemonSettings
+
+def getDaemonSocketPath(config):
+    return os.path.join(os.path.dirname(os.path.abspath(configFile)), getDaemonSettings(config)['socketPath'])
+
+def queryDaemon(config, request, timeout=None):
+    """Send one request to the prefetch daemon
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    request : dict
+        Request with a command, Ex. {'command': 'ping'}
+    timeout : float
+        Seconds to wait for the answer, clientTimeout of daemonSettings when not given
+
+    Returns
+    -------
+    dict
+        daemon answer or None when the daemon is disabled or not running
+    """
+    import socket
+    daemonSettings = getDaemonSettings(config)
+    if not daemonSettings['enabled'] or not hasattr(socket, 'AF_UNIX'):
+        return None
+    socketPath = getDaemonSocketPath(config)
+    if not os.path.exists(socketPath):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as daemonSocket:
+            daemonSocket.settimeout(timeout or daemonSettings['clientTimeout'])
+            daemonSocket.connect(socketPath)
+            daemonSocket.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            daemonSocket.shutdown(socket.SHUT_WR)
+            responseData = b''.join(iter(lambda: daemonSocket.recv(65536), b''))
+        return json.loads(responseData.decode('utf-8'))
+    except (OSError, ValueError):
+        # Stale socket file, daemon stopped or too slow, callers fetch directly
+        return None
+
+def fetchDaemonRuns(config, pipeLineName, branchName):
+    daemonRequest = {
+        'command': 'runs',
+        'pipeLineName': pipeLineName,
+        'branchName': branchName,
+        'runs': getRunSettings(config)['runsToConsider'],
+        'configSignature': getConfigSignature()
+    }
+    response = queryDaemon(config, daemonRequest)
+    if response is None:
+        return None
+    if response.get('error'):
+        print(colored("Prefetch daemon: {}".format(response['error']), 'yellow'))
+        return None
+    recordCacheLookup('daemon', response['cached'])
+    return response['runs']
+
+class PrefetchDaemon:
+    """Serve latest runs from memory over a unix domain socket
+
+    Runs of the previous job and the recent branches of the most used repos
+    are fetched every prefetchInterval on pooled sessions. Other branches are
+    fetched when asked and runs older than maxAge are fetched again, runs
+    which include a build still in progress only within activeMaxAge.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.settings = getDaemonSettings(config)
+        self.configSignature = getConfigSignature()
+        self.runs = {}
+        self.lock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.startedAt = time.time()
+        self.crumbRefreshedAt = time.monotonic()
+        self.counts = {'hits': 0, 'misses': 0, 'fetches': 0, 'errors': 0}
+        self.server = None
+
+    def getTargets(self):
+        # State is reread as the menus update it while the daemon runs
+        with configLock:
+            loadState(self.config, withUserInfo=False)
+        targets = []
+        previousJobRun = self.config.get('previousJobRun', {})
+        if previousJobRun.get('pipeLineName') and previousJobRun.get('branchOption') not in ('', None, 'exit'):
+            targets.append((previousJobRun['pipeLineName'], previousJobRun['branchOption']))
+        repoUsage = self.config.get('repoUsage', {})
+        recentBranches = self.config.get('recentBranches', {})
+        usedRepos = sorted(recentBranches, key=lambda repo: repoUsage.get(repo, 0), reverse=True)
+        for repo in usedRepos[:self.settings['prefetchRepos']]:
+            try:
+                pipeLineName = findPipeLine(self.config, repo)['name']
+            except ValueError:
+                continue
+            for branchOption in getRecentBranches(self.config, repo)[:self.settings['branchesPerRepo']]:
+                if (pipeLineName, branchOption) not in targets:
+                    targets.append((pipeLineName, branchOption))
+        return targets
+
+    def fetchRuns(self, pipeLineName, branchName, runCount):
+        fetchedAt = time.time()
+        runsInfo = fetchJobRuns(self.config, pipeLineName, branchName, runCount)
+        with self.lock:
+            self.runs[(pipeLineName, branchName, runCount)] = (fetchedAt, runsInfo)
+            self.counts['fetches'] += 1
+        return fetchedAt, runsInfo
+
+    def getMaxAge(self, runsInfo):
+        # Running builds change status any moment, serve them only while very fresh
+        if all(runInfo['status'] in completedRunStatuses for runInfo in runsInfo):
+            return self.settings['maxAge']
+        return self.settings['activeMaxAge']
+
+    def getRuns(self, pipeLineName, branchName, runCount):
+        with self.lock:
+            cachedRuns = self.runs.get((pipeLineName, branchName, runCount))
+            cached = cachedRuns is not None and time.time() - cachedRuns[0] <= self.getMaxAge(cachedRuns[1])
+            self.counts['hits' if cached else 'misses'] += 1
+        fetchedAt, runsInfo = cachedRuns if cached else self.fetchRuns(pipeLineName, branchName, runCount)
+        return {'runs': runsInfo, 'fetchedAt': fetchedAt, 'cached': cached}
+
+    def refreshCrumb(self):
+        if time.monotonic() - self.crumbRefreshedAt < self.settings['crumbRefreshInterval']:
+            return
+        try:
+            crumb = getUserAuthToken(self.config)
+        except Exception:
+            print(colored("Could not refresh crumb, keeping the current one", 'red'))
+            return
+        with configLock:
+            self.config['userInfo']['crumb'] = crumb
+        updateSessionCrumb(crumb)
+        self.crumbRefreshedAt = time.monotonic()
+
+    def prefetch(self):
+        self.refreshCrumb()
+        targets = self.getTargets()
+        runCount = getRunSettings(self.config)['runsToConsider']
+
+        def prefetchTarget(target):
+            self.fetchRuns(target[0], target[1], runCount)
+            return {}
+
+        for index, record in runConcurrently(targets, prefetchTarget, self.settings['prefetchWorkers']):
+            if record.get('error'):
+                with self.lock:
+                    self.counts['errors'] += 1
+                print(colored("Prefetch of {} {} failed: {}".format(targets[index][0], urllib.parse.unquote(targets[index][1]), record['error']), 'red'))
+        # Runs older than maxAge are fetched again when asked, no need to keep them
+        expiredBefore = time.time() - self.settings['maxAge']
+        with self.lock:
+            for runsKey in [runsKey for runsKey, cachedRuns in self.runs.items() if cachedRuns[0] < expiredBefore]:
+                del self.runs[runsKey]
+
+    def prefetchLoop(self):
+        while not self.stopEvent.is_set():
+            self.prefetch()
+            self.stopEvent.wait(self.settings['prefetchInterval'])
+
+    def getStatus(self):
+        now = time.time()
+        with self.lock:
+            cachedRuns = [
+                {'pipeLineName': runsKey[0], 'branch': urllib.parse.unquote(runsKey[1]), 'runs': runsKey[2], 'ageSeconds': round(now - fetchedAt, 1)}
+                for runsKey, (fetchedAt, runsInfo) in self.runs.items()
+            ]
+            status = dict(self.counts)
+        status.update({'pid': os.getpid(), 'uptimeSeconds': round(now - self.startedAt), 'cachedRuns': cachedRuns})
+        return status
+
+    def stop(self):
+        self.stopEvent.set()
+        # shutdown waits for serve_forever so it can not run on a handler thread
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def handleRequest(self, request):
+        command = request.get('command')
+        if command == 'ping':
+            return {'pid': os.getpid()}
+        if command == 'status':
+            return self.getStatus()
+        if command == 'stop':
+            return {'stopped': True}
+        if command == 'runs':
+            if request.get('configSignature') != self.configSignature:
+                return {'error': "jenkins.json changed after the daemon started, restart it"}
+            return self.getRuns(request['pipeLineName'], request['branchName'], request['runs'])
+        return {'error': "Unknown command {}".format(command)}
+
+    def serve(self):
+        import socketserver
+
+        class DaemonRequestHandler(socketserver.StreamRequestHandler):
+            """Answer one json request line with one json response"""
+
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline().decode('utf-8'))
+                except ValueError:
+                    request = {}
+                try:
+                    response = self.server.prefetchDaemon.handleRequest(request)
+                except Exception as e:
+                    response = {'error': str(e) or type(e).__name__}
+                self.wfile.write(json.dumps(response).encode('utf-8'))
+                # Stopped after answering, the process exits once serve_forever returns
+                if response.get('stopped'):
+                    self.server.prefetchDaemon.stop()
+
+        socketPath = getDaemonSocketPath(self.config)
+        if queryDaemon(self.config, {'command': 'ping'}, 1) is not None:
+            raise ValueError("Prefetch daemon is already running on {}".format(socketPath))
+        if os.path.exists(socketPath):
+            # Left over by a daemon which did not exit cleanly
+            os.remove(socketPath)
+        # Only the current user may connect, answers carry authenticated data
+        previousUmask = os.umask(0o177)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(socketPath, DaemonRequestHandler)
+        finally:
+            os.umask(previousUmask)
+        self.server.daemon_threads = True
+        self.server.prefetchDaemon = self
+        threading.Thread(target=self.prefetchLoop, daemon=True).start()
+        print(colored("Prefetch daemon listening on {}".format(socketPath), 'green'))
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stopEvent.set()
+            self.server.server_close()
+            if os.path.exists(socketPath):
+                os.remove(socketPath)
+
+def printDaemonStatus(status):
+    print("Prefetch daemon pid {}, up {}s, {} hits, {} misses, {} fetches, {} errors".format(status['pid'], status['uptimeSeconds'], status['hits'], status['misses'], status['fetches'], status['errors']))
+    for cachedRun in status['cachedRuns']:
+        print("{:<40} {:<40} {:>3} runs {:>8}".format(cachedRun['pipeLineName'], cachedRun['branch'], cachedRun['runs'], "{}s old".format(cachedRun['ageSeconds'])))
+
+def batchDaemon(config, args, output):
+    import socketserver
+    import signal
+    if not getDaemonSettings(config)['enabled']:
+        raise ValueError("Prefetch daemon is disabled in daemonSettings")
+    if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        raise ValueError("Prefetch daemon needs unix domain sockets")
+    if args.stop or args.status:
+        response = queryDaemon(config, {'command': 'stop' if args.stop else 'status'}, 5)
+        if response is None:
+            raise ValueError("Prefetch daemon is not running")
+        if args.format != 'text':
+            output.write(json.dumps(response) + '\n')
+        elif args.stop:
+            print(colored("Prefetch daemon stopped", 'green'))
+        else:
+            printDaemonStatus(response)
+        return 0
+    # Exit through the finally of serve so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signalNumber, frame: sys.exit(0))
+    try:
+        PrefetchDaemon(config).serve()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def buildBatchParser(config):
+    import argparse
+    runSettings = getRunSettings(config)
+    parser = argparse.ArgumentParser(description="Non interactive jenkins commands, run without arguments for menus")
+    subParsers = parser.add_subparsers(dest='command', required=True)
+
+    outputParser = argparse.ArgumentParser(add_help=False)
+    outputParser.add_argument('--format', choices=['text', 'json', 'ndjson'], default='text', help="Output format")
+    outputParser.add_argument('--workers', type=int, default=runSettings['batchWorkers'], help="Targets processed concurrently")
+
+    targetParser = argparse.ArgumentParser(add_help=False)
+    targetParser.add_argument('targets', nargs='*', help="Repo or pipeline name optionally followed by :branch, Ex. om-order:feature/pre-develop")
+    targetParser.add_argument('--branch', help="Branch for targets given without one")
+    targetParser.add_argument('--all', action='store_true', help="Add every pipeline which is not excluded")
+
+    runsParser = subParsers.add_parser('runs', parents=[outputParser, targetParser], help="Latest runs with commits and stages")
+    runsParser.add_argument('--limit', type=int, default=runSettings['runsToConsider'], help="Number of runs per target")
+    runsParser.set_defaults(handler=batchRuns)
+
+    diffParser = subParsers.add_parser('diff', parents=[outputParser, targetParser], help="Console lines of a failed job which are not in the last green job")
+    diffParser.add_argument('--job', default='lastFailedBuild', help="Failing job number, Ex. 42 or lastFailedBuild")
+    diffParser.add_argument('--green', help="Green job to compare with, defaults to the last successful job before --job")
+    diffParser.set_defaults(handler=batchDiff)
+
+    historyParser = subParsers.add_parser('history', parents=[outputParser, targetParser], help="Stage duration percentiles, trends and regressions")
+    historyParser.add_argument('--runs', type=int, default=getHistorySettings(config)['runs'], help="Number of runs per target")
+    historyParser.set_defaults(handler=batchHistory)
+
+    errorsParser = subParsers.add_parser('errors', parents=[outputParser, targetParser], help="Errors of a job")
+    errorsParser.add_argument('--job', default='lastBuild', help="Job number, Ex. 42 or lastFailedBuild")
+    errorsParser.set_defaults(handler=batchErrors)
+
+    consoleParser = subParsers.add_parser('console', parents=[targetParser], help="Console text of a job")
+    consoleParser.add_argument('--format', choices=['text', 'ndjson'], default='text', help="Output format")
+    consoleParser.add_argument('--job', default='lastBuild', help="Job number, Ex. 42 or lastFailedBuild")
+    consoleParser.add_argument('--from-line', type=int, default=1, help="First line to print")
+    consoleParser.add_argument('--lines', type=int, help="Number of lines to print")
+    consoleParser.add_argument('--grep', help="Print only lines matching a regular expression, prefixed with their line number")
+    consoleParser.set_defaults(handler=batchConsole)
+
+    promoteParser = subParsers.add_parser('promote', parents=[outputParser], help="Promote repos to an environment")
+    promoteParser.add_argument('repos', nargs='+', help="Repo names optionally with tag, Ex. om-order or om-order=31E7E3")
+    promoteParser.add_argument('--env', required=True, help="Environment (dev,qa,ua)")
+    promoteParser.add_argument('--tag', help="Image tag for repos given without one, Ex. 31E7E3")
+    promoteParser.add_argument('--pipeline', default='OpenShift-Promotions', help="Promotions pipeline")
+    promoteParser.add_argument('--wait', action='store_true', help="Follow every promotion until its build finishes")
+    promoteParser.set_defaults(handler=batchPromote)
+
+    bulkPromoteParser = subParsers.add_parser('bulk-promote', parents=[outputParser], help="Bulk promote services")
+    bulkPromoteParser.add_argument('services', nargs='*', help="Services as <repo>=<tag>, read from stdin when empty or -")
+    bulkPromoteParser.add_argument('--env', required=True, help="Environment (DEV,QA,UA)")
+    bulkPromoteParser.add_argument('--pipeline', default='OpenShift-Bulk-Promotions', help="Bulk promotions pipeline")
+    bulkPromoteParser.add_argument('--wait', action='store_true', help="Follow the bulk promotion until its build finishes")
+    bulkPromoteParser.set_defaults(handler=batchBulkPromote)
+
+    scaleParser = subParsers.add_parser('scale', parents=[outputParser], help="Scale micro services")
+    scaleParser.add_argument('services', nargs='+', help="Micro services, Ex. om-order-v1-0")
+    scaleParser.add_argument('--env', required=True, help="Environment (dev,qa,ua)")
+    scaleParser.add_argument('--replicas', type=int, required=True, help="Replicas (0-20)")
+    scaleParser.add_argument('--pipeline', required=True, help="Scaling pipeline")
+    scaleParser.add_argument('--parallel', action='store_true', help="Submit one scale job per service concurrently")
+    scaleParser.add_argument('--wait', action='store_true', help="Follow scale jobs until their builds finish")
+    scaleParser.set_defaults(handler=batchScale)
+
+    dashboardParser = subParsers.add_parser('dashboard', parents=[outputParser], help="Latest run status of every pipeline")
+    dashboardParser.add_argument('--branch', help="Branch shown for every pipeline")
+    dashboardParser.add_argument('--all-branches', action='store_true', help="Show every branch from repoBranches")
+    dashboardParser.add_argument('--interval', type=int, help="Refresh every given seconds, renders once when not given")
+    dashboardParser.set_defaults(handler=batchDashboard)
+
+    refreshParser = subParsers.add_parser('refresh-branches', parents=[outputParser], help="Refresh repo branches")
+    refreshParser.add_argument('repos', nargs='*', help="Repos to refresh, all when empty")
+    refreshParser.set_defaults(handler=batchRefreshBranches)
+
+    daemonParser = subParsers.add_parser('daemon', help="Prefetch runs in the background and serve them to the menus over a unix socket")
+    daemonParser.add_argument('--format', choices=['text', 'json'], default='text', help="Output format of --status")
+    daemonParser.add_argument('--status', action='store_true', help="Show runs held by the running daemon")
+    daemonParser.add_argument('--stop', action='store_true', help="Stop the running daemon")
+    daemonParser.set_defaults(handler=batchDaemon)
+    return parser
+
+def ensureBatchLogin(config):
+    userInfo = config['userInfo']
+    if not userInfo['objectId'] or not userInfo['appToken']:
+        raise ValueError("User information is not available, please provide it in jenkins.json")
+    if not userInfo['crumb']:
+        tokenResponse = makeAuthRequest('crumbIssuer/api/json', 'get', config)
+        if not isinstance(tokenResponse, dict) or not tokenResponse.get('crumb'):
+            raise ValueError("No auth token available")
+        saveUserAuthToken(config, tokenResponse['crumb'])
+
+def runBatch(config, argv):
+    """Run a non interactive command
+
+    Parameters
+    ----------
+    config : dict
+        config json object
+    argv : list
+        Command line arguments without script name
+
+    Returns
+    -------
+    int
+        exit code, 1 when any target failed
+    """
+    parser = buildBatchParser(config)
+    args = parser.parse_args(argv)
+    output = sys.stdout
+    # Keep json output parsable, diagnostics printed while fetching go to stderr
+    redirectTarget = sys.stderr if args.format != 'text' else sys.stdout
+    try:
+        with contextlib.redirect_stdout(redirectTarget):
+            ensureBatchLogin(config)
+            errorCount = args.handler(config, args, output)
+    except ValueError as e:
+        print(colored(str(e), 'red'), file=sys.stderr)
+        return 2
+    return 1 if errorCount else 0
+
 def main():
     """Starting point of script
 
@@ -540,21 +4181,40 @@ def main():
     global pipeLineName
     global configFile
 
+    # Reports are printed at exit as menus take over the terminal
+    if popCommandLineFlag('--profile-startup'):
+        atexit.register(printStartupProfile)
+    if popCommandLineFlag('--stats'):
+        atexit.register(printStatsReport)
+    statsFilePath = popCommandLineOption('--stats-json')
+    if statsFilePath:
+        atexit.register(writeStatsJson, os.path.abspath(statsFilePath))
+    startupTimings['imports'] = importsDoneTime - scriptStartTime
+
     # Getting script directory to get config file when script gets loaded from other directories
     script_directory = os.path.dirname(os.path.abspath(sys.argv[0]))
     # print(script_directory)
     configFile = os.path.join(script_directory, configFile)
 
+    parseStartTime = time.perf_counter()
     config = loadConfig(configFile)
+    recordStartupTiming('config parse', parseStartTime)
+    parseStartTime = time.perf_counter()
+    config = loadState(config)
+    recordStartupTiming('state parse', parseStartTime)
+
+    if len(sys.argv) > 1:
+        sys.exit(runBatch(config, sys.argv[1:]))
 
     # Check if config file has enough user information
     checkUserInfo(config)
 
-
     pipeLineList = config['pipeLineList']
     repoListNames = getRepositoryNames(pipeLineList)
     
+    from pick import pick
     repoTitle = 'Please choose your repo: '
+    recordStartupTiming('time to first menu', scriptStartTime)
     repoOption, repoIndex = pick(repoListNames, repoTitle, indicator='=>', default_index=0)
 
     # print(repoOption)
@@ -564,6 +4224,8 @@ def main():
         sys.exit()
     if repoOption == 'Update repo branches':
         updateRepoBranches(pipeLineList, config)
+    elif repoOption == 'Dashboard':
+        runDashboard(config, interval=getDashboardSettings(config)['interval'])
     elif repoOption == 'Run Previous Job':
         pipeLineName = config["previousJobRun"]["pipeLineName"]
         repoName = config["previousJobRun"]["repoName"]
@@ -579,30 +4241,30 @@ def main():
         pipeLineName = getPipeLineInfo(pipeLineList, repoIndex, 'name')
         
         if pipeLineName == 'OpenShift-Promotions':
-            runActions = ['Get Runs', 'Get Errors', 'Get Console Text', 'Promotions', 'Exit']
+            runActions = ['Get Runs', 'Get Errors', 'Get Console Text', 'Tail Console', 'Promotions', 'Parallel Promotions', 'Exit']
             handleRunActions(runActions)
         elif pipeLineName == 'OpenShift-Bulk-Promotions':
-            runActions = ['Get Runs', 'Get Errors', 'Get Console Text', 'Bulk Promotions', 'Exit']
+            runActions = ['Get Runs', 'Get Errors', 'Get Console Text', 'Tail Console', 'Bulk Promotions', 'Exit']
             handleRunActions(runActions)
         else:
             if pipeLineName:
                 repoName = getPipeLineInfo(pipeLineList, repoIndex, 'repo')
-                repoBranches = config['repoBranches'][repoName]
+                repoBranches = getRepoBranches(config, pipeLineName, repoName)
                 # print(repoBranches)
                 processedRepoBranches = processRepoBranches(repoBranches)
                 # print(processedRepoBranches)
                 branchesRawList = processedRepoBranches['keys']
                 branchesList = processedRepoBranches['values']
-                branchData = branchPick(branchesList, branchesRawList)
+                branchData = branchPick(branchesList, branchesRawList, getRecentBranches(config, repoName))
                 branchOption = branchData['option']
                 branchName = branchData['name']
 
-                printCurrentJobInfo(repoName, branchName)
-                saveCurrentJobRuns(config, pipeLineName, repoName, branchName, branchOption)
-                
                 if branchOption == 'exit':
                     print("{}".format(colored('Exiting...', 'red', attrs=['bold'])))
                     sys.exit()
+
+                printCurrentJobInfo(repoName, branchName)
+                saveCurrentJobRuns(config, pipeLineName, repoName, branchName, branchOption)
                 
                 handleRunActions()
 